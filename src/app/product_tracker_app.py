@@ -1,25 +1,31 @@
 import math
+import os
 import re
-from typing import List
+from datetime import datetime
+from typing import Callable, List, Optional
 from httpx import HTTPStatusError
 
 import pandas as pd
 import tkinter as tk
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 from tktooltip import ToolTip
 
-from src.models.product import Product
+from src.models.price_alert import AlertRule
+from src.models.product_record import ProductRecord
+from src.repository.payload_archive import PayloadArchive
+from src.repository.product_query import ProductQuery
 from src.repository.product_repository import ProductRepository
 from src.service.product_coordinator_service import ProductCoordinatorService
+from src.service.product_import_service import ProductImportService, ImportResult
 from src.tools.csv_tools import save_products_to_csv
 
 
 class ProductTrackerApp(tk.Tk):
-    _number_of_main_components = 6
+    _number_of_main_components = 7
 
-    def __init__(self, size: tuple = (2000, 1200)):
+    def __init__(self, size: tuple = (2000, 1200), archive_payloads: bool = True):
         super().__init__()
         self.title("Product Price Tracker")
         self.geometry(f"{size[0]}x{size[1]}")
@@ -27,7 +33,13 @@ class ProductTrackerApp(tk.Tk):
         self.create_buttons()
         # Services
         self.product_repository = ProductRepository()
-        self.product_coordinator = ProductCoordinatorService()
+        payload_archive = None
+        if archive_payloads:
+            payload_archive = PayloadArchive(os.path.join(self.product_repository.database_dir, "payloads.db"))
+        self.product_coordinator = ProductCoordinatorService(payload_archive=payload_archive)
+        today = datetime.now().strftime('%Y-%m-%d')
+        self.product_coordinator.seed_lookup_cache(self.product_repository.get_products_between(today, today))
+        self.product_import_service = ProductImportService(self.product_repository, self.product_coordinator)
 
     def run_application(self):
         """Run the main application loop."""
@@ -63,6 +75,10 @@ class ProductTrackerApp(tk.Tk):
         download_csv_button.pack(side="left", padx=5)
         ToolTip(download_csv_button, msg="Download all products to a CSV file", x_offset=25, y_offset=25)
 
+        price_alerts_button = ttk.Button(btn_frame, text="Price Alerts", command=self.show_price_alerts)
+        price_alerts_button.pack(side="left", padx=5)
+        ToolTip(price_alerts_button, msg="Show price alerts and manage alert rules", x_offset=25, y_offset=25)
+
     def update_products_ui(self):
         """
         Display UI for downloading all products to CSV with a user-provided filename.
@@ -109,11 +125,21 @@ class ProductTrackerApp(tk.Tk):
             # Save products
             progress_label.config(text="Saving updated products...")
             self.update_idletasks()
-            for product in today_update:
-                self.product_repository.save_product(product)
+            new_alerts = self.product_repository.save_products(today_update.products).alerts
+            self.product_repository.record_fetch_results(today_update.fetched, today_update.missing)
+            self.product_repository.archive_old_products()
             progress_bar['value'] = 100
 
-            messagebox.showinfo("Success", "Products updated successfully!")
+            status_counts = self.product_repository.get_stockcode_status_counts()
+            failed = sum(len(stockcodes) for stockcodes in today_update.failed.values())
+            messagebox.showinfo(
+                "Success",
+                f"Products updated successfully!\n"
+                f"Updated: {len(today_update.products)}, failed: {failed}\n"
+                f"Wasted requests on missing products: {today_update.wasted_requests}\n"
+                f"Missing (backing off): {status_counts['missing']}, retired: {status_counts['retired']}\n"
+                f"New price alerts: {new_alerts}"
+            )
         except Exception as e:
             messagebox.showerror("Error", f"Failed to update products: {str(e)}")
         finally:
@@ -137,14 +163,18 @@ class ProductTrackerApp(tk.Tk):
         filename_entry.insert(0, "products")
         filename_entry.pack(expand=False, padx=(0, 10), ipadx=5)
 
-        download_button = ttk.Button(
-            download_frame,
-            text="Download CSV",
-            command=lambda: self._handle_csv_download(filename_entry)
-        )
+        # The filter is read from the controls when downloading, so there is no separate apply step
+        build_query = self._create_query_filter_bar(download_frame, ProductQuery())
+
+        def download():
+            query = build_query()
+            if query is not None:
+                self._handle_csv_download(filename_entry, query)
+
+        download_button = ttk.Button(download_frame, text="Download CSV", command=download)
         download_button.pack(side='bottom', padx=(0, 10), pady=30)
 
-    def _handle_csv_download(self, filename_entry):
+    def _handle_csv_download(self, filename_entry, query: ProductQuery = ProductQuery()):
         """
         Validate and trigger CSV download with custom filename.
         """
@@ -158,7 +188,7 @@ class ProductTrackerApp(tk.Tk):
         if not filename.lower().endswith(".csv"):
             filename += ".csv"
 
-        all_products = self.product_repository.get_all_products()
+        all_products = self.product_repository.query_products(query)
         successful, message = save_products_to_csv(all_products, filename)
 
         if not successful:
@@ -166,15 +196,16 @@ class ProductTrackerApp(tk.Tk):
         else:
             messagebox.showinfo("Success", f"Products saved to {filename}")
 
-    def show_price_graph(self, transform: bool = False, selected_products: list[str] = None):
-        """Show a graph of product prices over time, with optional product filtering."""
+    def show_price_graph(self, transform: bool = False, selected_products: list[str] = None,
+                         query: ProductQuery = ProductQuery()):
+        """Show a graph of product prices over time, with optional product, date range and store filtering."""
         self.destroy_non_main_components()
 
-        all_products = self.product_repository.get_all_products()
-
-        # Filter products if selection is given
+        # Filter products if selection is given; the filters are applied by the database
+        graph_query = query.select("date", "product_name", "price")
         if selected_products:
-            all_products = [p for p in all_products if p.product_name in selected_products]
+            graph_query = graph_query.for_product_names(selected_products)
+        all_products = self.product_repository.query_products(graph_query)
 
         data = {
             "date": [p.date for p in all_products],
@@ -188,8 +219,17 @@ class ProductTrackerApp(tk.Tk):
         # Layout
         plot_frame = ttk.Frame(self)
         plot_frame.pack(fill='both', pady=10, expand=True)
+        self._create_query_filter_bar(
+            plot_frame, query,
+            lambda new_query: self.show_price_graph(transform, selected_products, new_query)
+        )
         fig, ax = plt.subplots(figsize=(10, 6))
-        pivot.plot(ax=ax, title="Product Price History", marker='o')
+        if pivot.empty:
+            # Date range and store filters can leave nothing to plot
+            ax.set_title("Product Price History")
+            ax.text(0.5, 0.5, "No prices match the selected filters", ha="center", transform=ax.transAxes)
+        else:
+            pivot.plot(ax=ax, title="Product Price History", marker='o')
         ax.set_xlabel("Date")
         ax.set_ylabel("Price")
         ax.grid(True)
@@ -202,7 +242,7 @@ class ProductTrackerApp(tk.Tk):
         filter_button = ttk.Button(
             plot_frame,
             text="Filter Products",
-            command=lambda: self.open_filter_popup(transform, selected_products)
+            command=lambda: self.open_filter_popup(transform, selected_products, query)
         )
         filter_button.pack(side="left", padx=20, pady=10)
         ToolTip(filter_button, msg="Filter products on graph", x_offset=25, y_offset=25)
@@ -212,17 +252,18 @@ class ProductTrackerApp(tk.Tk):
         log_transform_button = ttk.Button(
             plot_frame,
             text=text,
-            command=lambda: self.show_price_graph(not transform, selected_products)
+            command=lambda: self.show_price_graph(not transform, selected_products, query)
         )
         log_transform_button.pack(side="left", padx=30, pady=10)
         message = f"Transform data {'back to Normal pricing' if transform else 'to Log10()'}"
         ToolTip(log_transform_button, msg=message, x_offset=25, y_offset=25)
 
-    def open_filter_popup(self, transform: bool, selected_products: list[str]):
+    def open_filter_popup(self, transform: bool, selected_products: list[str], query: ProductQuery = ProductQuery()):
         """
         Open a resizable popup window allowing the user to select which products to display on the graph.
         :param transform: Indicates whether the current graph uses log transformation.
         :param selected_products: A list of product names currently selected (to preselect in the popup).
+        :param query: The date range and store filters currently applied to the graph.
         """
         popup = tk.Toplevel(self)
         popup.title("Select Products")
@@ -245,13 +286,14 @@ class ProductTrackerApp(tk.Tk):
         listbox.config(yscrollcommand=scrollbar.set)
 
         # Populate listbox
-        all_product_names = sorted(set(p.product_name for p in self.product_repository.get_all_products()))
+        all_product_names = self.product_repository.get_all_product_names()
         for name in all_product_names:
             listbox.insert(tk.END, name)
 
         if selected_products:
+            selected_names = set(selected_products)
             for i, name in enumerate(all_product_names):
-                if name in selected_products:
+                if name in selected_names:
                     listbox.select_set(i)
 
         # Apply button
@@ -259,35 +301,87 @@ class ProductTrackerApp(tk.Tk):
             popup,
             text="Apply Filter",
             command=lambda: self._apply_filter_and_close(
-                popup, listbox, all_product_names, transform
+                popup, listbox, all_product_names, transform, query
             )
         )
         apply_button.grid(row=2, column=0, columnspan=2, pady=(0, 10))
 
         popup.grab_set()  # Modal behavior
 
-    def _apply_filter_and_close(self, popup, listbox, all_product_names, transform):
+    def _apply_filter_and_close(self, popup, listbox, all_product_names, transform, query=ProductQuery()):
         """
         Apply the selected product filters from the popup and refresh the graph.
         :param popup: The popup window containing the product filter UI.
         :param listbox: The listbox widget with selectable product names.
         :param all_product_names: The complete list of product names in display order.
         :param transform: Whether to use logarithmic transformation for the prices.
+        :param query: The date range and store filters currently applied to the graph.
         """
         selected = [all_product_names[i] for i in listbox.curselection()]
         popup.destroy()
-        self.show_price_graph(transform=transform, selected_products=selected)
+        self.show_price_graph(transform=transform, selected_products=selected, query=query)
 
-    def show_product_table(self):
-        """Show a table of all products in the database."""
+    def _create_query_filter_bar(self, parent, query: ProductQuery,
+                                 on_apply: Optional[Callable[[ProductQuery], None]] = None
+                                 ) -> Callable[[], Optional[ProductQuery]]:
+        """
+        Create date range and store filter controls.
+        :param parent: The frame to add the controls to.
+        :param query: The filters currently applied, used to prefill the controls.
+        :param on_apply: Called with the updated ProductQuery when the filter is applied, or None for no apply button.
+        :returns: Callable building the ProductQuery from the current controls, or None if a date is invalid.
+        """
+        filter_frame = ttk.Frame(parent)
+        filter_frame.pack(pady=5)
+
+        date_entries = {}
+        for label_text, value in (("Start date:", query.start_date), ("End date:", query.end_date)):
+            ttk.Label(filter_frame, text=label_text).pack(side="left", padx=(10, 2))
+            entry = ttk.Entry(filter_frame, width=12)
+            entry.insert(0, value or "")
+            entry.pack(side="left")
+            date_entries[label_text] = entry
+
+        store_options = ["all"] + list(self.product_coordinator.services.keys())
+        store_var = tk.StringVar(value=next(iter(query.stores)) if query.stores else "all")
+        ttk.Label(filter_frame, text="Store:").pack(side="left", padx=(10, 2))
+        store_menu = ttk.OptionMenu(filter_frame, store_var, store_var.get(), *store_options)
+        store_menu.pack(side="left")
+
+        def build_query() -> Optional[ProductQuery]:
+            start_date = date_entries["Start date:"].get().strip()
+            end_date = date_entries["End date:"].get().strip()
+            for date in (start_date, end_date):
+                if date and not re.match(r"^\d{4}-\d{2}-\d{2}$", date):
+                    messagebox.showerror("Error", "Dates must be in YYYY-MM-DD format.")
+                    return None
+            new_query = query.between(start_date, end_date)
+            if store_var.get() == "all":
+                return new_query._replace(stores=None)
+            return new_query.for_stores([store_var.get()])
+
+        def apply_filter():
+            new_query = build_query()
+            if new_query is not None:
+                on_apply(new_query)
+
+        if on_apply is not None:
+            apply_button = ttk.Button(filter_frame, text="Apply Filter", command=apply_filter)
+            apply_button.pack(side="left", padx=10)
+        return build_query
+
+    def show_product_table(self, query: ProductQuery = ProductQuery()):
+        """Show a table of products in the database, with optional date range and store filtering."""
         self.destroy_non_main_components()
 
-        all_products = self.product_repository.get_all_products()
+        all_products = self.product_repository.query_products(query.select("date", "product_name", "price", "store"))
 
         style = ttk.Style()
         style.configure("Treeview", rowheight=40)
         style.configure("Treeview.Heading", anchor="center")
 
+        self._create_query_filter_bar(self, query, self.show_product_table)
+
         # Create a frame to hold the table and scrollbars
         frame = ttk.Frame(self)
         frame.pack(fill="both", expand=True, padx=10, pady=10)
@@ -333,6 +427,121 @@ class ProductTrackerApp(tk.Tk):
             table.insert("", "end", values=(product.date, product.product_name, product.price,
                                             product.store))
 
+    def show_price_alerts(self, include_acknowledged: bool = False):
+        """
+        Show fired price alerts and the alert rules, with controls to add and delete rules.
+        :param include_acknowledged: Whether to also list alerts that have been acknowledged.
+        """
+        self.destroy_non_main_components()
+
+        alerts_frame = ttk.Frame(self)
+        alerts_frame.pack(fill="both", expand=True, padx=10, pady=10)
+
+        # Fired alerts
+        ttk.Label(alerts_frame, text="Price alerts").pack(anchor="w")
+        alert_columns = ("Date", "Product", "Store", "Price", "Rule", "Message")
+        alert_table = ttk.Treeview(alerts_frame, columns=alert_columns, show="headings", height=10)
+        alert_widths = {"Date": 100, "Product": 300, "Store": 100, "Price": 80, "Rule": 150, "Message": 600}
+        for column in alert_columns:
+            alert_table.heading(column, text=column)
+            alert_table.column(column, width=alert_widths[column], anchor="center")
+        alert_table.pack(fill="both", expand=True, pady=5)
+
+        for alert in self.product_repository.get_price_alerts(include_acknowledged=include_acknowledged):
+            alert_table.insert("", "end", values=(alert.date, alert.product_name, alert.store, alert.price,
+                                                  alert.rule_name, alert.message))
+
+        alert_buttons = ttk.Frame(alerts_frame)
+        alert_buttons.pack(fill="x", pady=5)
+        ttk.Button(
+            alert_buttons,
+            text="Acknowledge All",
+            command=lambda: self._acknowledge_price_alerts(include_acknowledged)
+        ).pack(side="left", padx=5)
+        ttk.Button(
+            alert_buttons,
+            text="Show Unacknowledged" if include_acknowledged else "Show All",
+            command=lambda: self.show_price_alerts(not include_acknowledged)
+        ).pack(side="left", padx=5)
+
+        # Alert rules
+        ttk.Label(alerts_frame, text="Alert rules").pack(anchor="w", pady=(20, 0))
+        rule_columns = ("Name", "Type", "Threshold", "Store", "Stockcode")
+        rule_table = ttk.Treeview(alerts_frame, columns=rule_columns, show="headings", height=6)
+        for column in rule_columns:
+            rule_table.heading(column, text=column)
+            rule_table.column(column, width=200, anchor="center")
+        rule_table.pack(fill="both", expand=True, pady=5)
+
+        for rule in self.product_repository.get_alert_rules():
+            rule_table.insert("", "end", iid=str(rule.id),
+                              values=(rule.name, rule.rule_type, "" if rule.threshold is None else rule.threshold,
+                                      rule.store or "Any", rule.stockcode or "Any"))
+
+        # New rule form
+        rule_form = ttk.Frame(alerts_frame)
+        rule_form.pack(fill="x", pady=5)
+        rule_entries = {}
+        for field in ("name", "threshold", "store", "stockcode"):
+            ttk.Label(rule_form, text=f"{field.capitalize()}:").pack(side="left", padx=(10, 2))
+            entry = ttk.Entry(rule_form, width=15)
+            entry.pack(side="left")
+            rule_entries[field] = entry
+
+        rule_type_var = tk.StringVar(value=AlertRule.RULE_TYPES[0])
+        rule_type_menu = ttk.OptionMenu(rule_form, rule_type_var, rule_type_var.get(), *AlertRule.RULE_TYPES)
+        rule_type_menu.pack(side="left", padx=10)
+        ttk.Button(
+            rule_form,
+            text="Add Rule",
+            command=lambda: self._add_alert_rule(rule_entries, rule_type_var.get(), include_acknowledged)
+        ).pack(side="left", padx=5)
+        ttk.Button(
+            rule_form,
+            text="Delete Selected Rule",
+            command=lambda: self._delete_alert_rules(rule_table.selection(), include_acknowledged)
+        ).pack(side="left", padx=5)
+
+    def _add_alert_rule(self, rule_entries: dict, rule_type: str, include_acknowledged: bool) -> None:
+        """
+        Validate the new rule form and save the rule.
+        :param rule_entries: Entry widgets keyed by rule field name.
+        :param rule_type: The selected rule type.
+        :param include_acknowledged: Whether the alert view currently lists acknowledged alerts.
+        """
+        values = {field: entry.get().strip() for field, entry in rule_entries.items()}
+        try:
+            if not values["name"]:
+                raise ValueError("Rule name is required.")
+            threshold = float(values["threshold"]) if values["threshold"] else None
+            self.product_repository.add_alert_rule(values["name"], rule_type, threshold,
+                                                   values["store"], values["stockcode"])
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self.show_price_alerts(include_acknowledged)
+
+    def _delete_alert_rules(self, rule_ids: tuple, include_acknowledged: bool) -> None:
+        """
+        Delete the selected alert rules.
+        :param rule_ids: Ids of the selected rules.
+        :param include_acknowledged: Whether the alert view currently lists acknowledged alerts.
+        """
+        if not rule_ids:
+            messagebox.showwarning("No Rule Selected", "Please select a rule to delete.")
+            return
+        for rule_id in rule_ids:
+            self.product_repository.delete_alert_rule(int(rule_id))
+        self.show_price_alerts(include_acknowledged)
+
+    def _acknowledge_price_alerts(self, include_acknowledged: bool) -> None:
+        """
+        Acknowledge all price alerts and refresh the view.
+        :param include_acknowledged: Whether the alert view currently lists acknowledged alerts.
+        """
+        self.product_repository.acknowledge_price_alerts()
+        self.show_price_alerts(include_acknowledged)
+
     def add_new_product(self):
         """Open a new window to add a new product."""
         self.destroy_non_main_components()
@@ -389,8 +598,7 @@ class ProductTrackerApp(tk.Tk):
         add_row_button.pack(pady=10)
 
         # Create a Treeview table
-        columns: List[str] = list(Product._meta.fields.keys())
-        columns.remove('id')
+        columns: List[str] = list(ProductRecord._fields)
 
         style = ttk.Style()
         style.configure("Treeview", rowheight=40)
@@ -406,10 +614,18 @@ class ProductTrackerApp(tk.Tk):
         submit_table = ttk.Button(
             add_new_entry_frame,
             text="Add new entries",
-            command=lambda: self.add_new_entries_to_db(table)
+            command=lambda: self.add_new_entries_to_db(table, columns)
         )
         submit_table.pack(pady=10)
 
+        import_file_button = ttk.Button(
+            add_new_entry_frame,
+            text="Import File",
+            command=self.import_entries_from_file
+        )
+        import_file_button.pack(pady=10)
+        ToolTip(import_file_button, msg="Import historical entries from a CSV or JSON file", x_offset=25, y_offset=25)
+
     def add_new_product_row_to_table(self, table, columns: List[str]) -> None:
         """
         Open a new window to add a new row to the product table.
@@ -450,8 +666,8 @@ class ProductTrackerApp(tk.Tk):
                 if not price.replace('.', '', 1).isdigit():
                     raise ValueError("Price must be a valid number.")
                 row_data['price'] = float(price)
-                product = self.product_coordinator.get_product_by_stockcode(stockcode=stockcode, store=store)
-                row_data['product_name'] = product.product_name
+                if not row_data.get('product_name', '').strip():
+                    row_data['product_name'] = self.product_import_service.resolve_product_name(stockcode, store)
             except ValueError as e:
                 messagebox.showerror("Error", str(e))
                 return
@@ -464,9 +680,56 @@ class ProductTrackerApp(tk.Tk):
         submit_button = ttk.Button(new_row_frame, text="Submit", command=submit_new_row)
         submit_button.pack(pady=10)
 
-    def add_new_entries_to_db(self, table):
-        # error message as it is not implemented yet
-        messagebox.showerror("Error", "This feature is not implemented yet. Please try again later.")
+    def add_new_entries_to_db(self, table, columns: List[str]) -> None:
+        """
+        Save all rows in the entry table to the database.
+        :param table: The Treeview table containing the new entries.
+        :param columns: The list of column names for the table.
+        """
+        children = table.get_children("")
+        if not children:
+            messagebox.showwarning("No Entries", "Please add at least one row.")
+            return
+
+        rows = [dict(zip(columns, table.item(child, "values"))) for child in children]
+        try:
+            result = self.product_import_service.import_rows(rows)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to add entries: {str(e)}")
+            return
+
+        if not result.errors:
+            table.delete(*children)
+        self._show_import_result(result)
+
+    def import_entries_from_file(self) -> None:
+        """Import product entries from a CSV or JSON file chosen by the user."""
+        input_path = filedialog.askopenfilename(
+            title="Import Product Entries",
+            filetypes=[("CSV or JSON files", "*.csv *.json *.jsonl"), ("All files", "*.*")]
+        )
+        if not input_path:
+            return
+
+        try:
+            result = self.product_import_service.import_file(input_path)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to import {input_path}: {str(e)}")
+            return
+
+        self._show_import_result(result)
+
+    @staticmethod
+    def _show_import_result(result: ImportResult) -> None:
+        """Show a summary of an import, including the first few errors."""
+        message = f"Imported {result.imported} entries, skipped {result.skipped} existing entries."
+        if result.errors:
+            shown_errors = "\n".join(result.errors[:10])
+            more = f"\n... and {len(result.errors) - 10} more" if len(result.errors) > 10 else ""
+            messagebox.showwarning("Import Finished With Errors",
+                                   f"{message}\n{len(result.errors)} rows had errors:\n{shown_errors}{more}")
+        else:
+            messagebox.showinfo("Success", message)
 
     def find_product(self, stockcode: str, store: str, store_frame: ttk.Frame) -> None:
         """
@@ -517,8 +780,10 @@ class ProductTrackerApp(tk.Tk):
     def save_product_to_db(self, product) -> None:
         """Save the product to the database."""
         try:
-            self.product_repository.save_product(product)
-            messagebox.showinfo("Success", "Product saved to database successfully!")
+            if self.product_repository.save_product(product):
+                messagebox.showinfo("Success", "Product saved to database successfully!")
+            else:
+                messagebox.showinfo("Already Saved", f"This product is already saved for {product.date}.")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to save product: {str(e)}")
 
@@ -1,8 +1,63 @@
+import argparse
+import os
+
 from src.app.product_tracker_app import ProductTrackerApp
+from src.repository.payload_archive import PayloadArchive
+from src.repository.product_repository import ProductRepository
+from src.service.product_coordinator_service import ProductCoordinatorService
+from src.service.refresh_scheduler import RefreshScheduler
+
+
+def run_scheduler(archive_payloads: bool):
+    """Run the refresh scheduler until interrupted."""
+    product_repository = ProductRepository()
+    try:
+        RefreshScheduler(product_repository, create_coordinator(product_repository, archive_payloads)).run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        product_repository.close()
+
+
+def reprocess_payloads(start_date: str = None, end_date: str = None):
+    """Re-map archived raw payloads and save any rows missing from the database, without network access."""
+    product_repository = ProductRepository()
+    try:
+        product_coordinator = create_coordinator(product_repository, archive_payloads=True)
+        products = list(product_coordinator.reprocess_payload_archive(start_date, end_date))
+        result = product_repository.save_products(products)
+        print(f"Reprocessed {len(products)} archived payloads, saved {result.saved} new rows.")
+    finally:
+        product_repository.close()
+
+
+def create_coordinator(product_repository: ProductRepository, archive_payloads: bool) -> ProductCoordinatorService:
+    """Create the coordinator service, optionally archiving raw payloads next to the database."""
+    payload_archive = None
+    if archive_payloads:
+        payload_archive = PayloadArchive(os.path.join(product_repository.database_dir, "payloads.db"))
+    return ProductCoordinatorService(payload_archive=payload_archive)
 
 
 def main():
-    ProductTrackerApp().run_application()
+    parser = argparse.ArgumentParser(description="Supermarket Price Analysis")
+    parser.add_argument("--scheduler", action="store_true",
+                        help="Run the background refresh scheduler instead of the GUI")
+    parser.add_argument("--reprocess-payloads", action="store_true",
+                        help="Re-map archived raw payloads into the database without network access")
+    parser.add_argument("--start-date", help="First date (YYYY-MM-DD) to reprocess")
+    parser.add_argument("--end-date", help="Last date (YYYY-MM-DD) to reprocess")
+    parser.add_argument("--no-payload-archive", action="store_true",
+                        help="Do not archive raw product payloads")
+    args = parser.parse_args()
+
+    if args.reprocess_payloads:
+        reprocess_payloads(args.start_date, args.end_date)
+    elif args.scheduler:
+        run_scheduler(not args.no_payload_archive)
+    else:
+        ProductTrackerApp(archive_payloads=not args.no_payload_archive).run_application()
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,51 @@
+from peewee import Model, CharField, FloatField, BooleanField, IntegerField
+
+
+class AlertRule(Model):
+    """User-defined price alert rule, optionally limited to one store and/or stockcode."""
+    BELOW_PRICE = "below_price"
+    ALL_TIME_LOW = "all_time_low"
+    HALF_PRICE = "half_price"
+    PRICE_RISE_PERCENT = "price_rise_percent"
+    RULE_TYPES = (BELOW_PRICE, ALL_TIME_LOW, HALF_PRICE, PRICE_RISE_PERCENT)
+
+    name = CharField()
+    rule_type = CharField()
+    threshold = FloatField(null=True)
+    store = CharField(null=True)
+    stockcode = CharField(null=True)
+    enabled = BooleanField(default=True)
+
+
+class PriceAlert(Model):
+    """An alert fired by a rule for a newly saved observation."""
+    rule_id = IntegerField()
+    rule_name = CharField()
+    date = CharField()
+    store = CharField()
+    stockcode = CharField()
+    product_name = CharField()
+    price = FloatField()
+    message = CharField()
+    acknowledged = BooleanField(default=False)
+
+    class Meta:
+        indexes = (
+            (('acknowledged', 'date'), False),
+            (('rule_id', 'date', 'store', 'stockcode'), True),
+        )
+
+
+class ProductPriceStats(Model):
+    """Running per-product price statistics, kept up to date as observations are saved."""
+    store = CharField()
+    stockcode = CharField()
+    last_date = CharField()
+    last_price = FloatField()
+    min_price = FloatField()
+    max_price = FloatField()
+
+    class Meta:
+        indexes = (
+            (('store', 'stockcode'), True),
+        )
@@ -17,3 +17,11 @@ class Product(Model):
     cup_measure = CharField()
     cup_string = CharField()
     store = CharField()
+
+    class Meta:
+        indexes = (
+            (('date',), False),
+            (('stockcode', 'date'), False),
+            (('product_name', 'date'), False),
+            (('store', 'date'), False),
+        )
@@ -0,0 +1,26 @@
+from typing import NamedTuple, Dict, Any
+
+
+class ProductRecord(NamedTuple):
+    """Immutable, lightweight product observation used by the fetch and export paths."""
+    date: str
+    stockcode: str
+    product_name: str
+    price: float
+    is_on_special: bool
+    is_half_price: bool
+    was_price: float
+    savings_amount: float
+    package_size: str
+    unit_weight_in_grams: float
+    cup_price: float
+    cup_measure: str
+    cup_string: str
+    store: str
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Convert the record to a plain dictionary keyed by field name.
+        :returns: Dictionary of field values
+        """
+        return self._asdict()
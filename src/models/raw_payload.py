@@ -0,0 +1,30 @@
+from peewee import Model, CharField, BlobField, IntegerField
+
+
+class PayloadDictionary(Model):
+    """Shared zstd dictionary trained on sample payloads."""
+    data = BlobField()
+    sample_count = IntegerField()
+    created = CharField()
+
+
+class RawPayload(Model):
+    """Compressed raw product payload, stored once per unique content hash."""
+    content_hash = CharField(primary_key=True)
+    dictionary_id = IntegerField(default=0)
+    size = IntegerField()
+    data = BlobField()
+
+
+class PayloadObservation(Model):
+    """Links a store, stockcode and date to the payload fetched for it."""
+    store = CharField()
+    stockcode = CharField()
+    date = CharField()
+    content_hash = CharField()
+
+    class Meta:
+        indexes = (
+            (('store', 'stockcode', 'date'), True),
+            (('date',), False),
+        )
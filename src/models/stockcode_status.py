@@ -0,0 +1,20 @@
+from peewee import Model, CharField, IntegerField
+
+
+class StockcodeStatus(Model):
+    """Lifecycle status of a tracked stockcode: active, missing or retired."""
+    ACTIVE = "active"
+    MISSING = "missing"
+    RETIRED = "retired"
+
+    store = CharField()
+    stockcode = CharField()
+    status = CharField(default=ACTIVE)
+    missing_since = CharField(null=True)
+    failure_count = IntegerField(default=0)
+    next_retry = CharField(null=True)
+
+    class Meta:
+        indexes = (
+            (('store', 'stockcode'), True),
+        )
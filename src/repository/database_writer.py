@@ -0,0 +1,107 @@
+import threading
+from concurrent.futures import Future
+from queue import Queue, Empty
+from typing import Any, Callable, List, Optional, Tuple
+
+from peewee import Database
+
+
+class DatabaseWriter:
+    """Single background writer that serializes database writes and commits queued writes in batches."""
+
+    def __init__(self, database: Database, on_commit: Optional[Callable[[], None]] = None,
+                 max_batch_size: int = 64):
+        self.database = database
+        self.on_commit = on_commit
+        self.max_batch_size = max_batch_size
+        self._queue: "Queue[Optional[Tuple[Future, Callable, tuple, dict]]]" = Queue()
+        self._closed = False
+        self._close_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="database-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, function: Callable, *args, **kwargs) -> Future:
+        """
+        Queue a write to run on the writer thread.
+        :param function: Callable performing the write
+        :returns: Future resolved with the callable's result once its batch has been committed
+        :raises RuntimeError: If the writer has been closed
+        """
+        future = Future()
+        if threading.current_thread() is self._thread:
+            # Writes issued from within a write run inline to avoid waiting on ourselves
+            future.set_result(function(*args, **kwargs))
+            return future
+        with self._close_lock:
+            # A write queued behind the stop marker would never run and its caller would wait forever
+            if self._closed:
+                raise RuntimeError("The database writer is closed.")
+            self._queue.put((future, function, args, kwargs))
+        return future
+
+    def execute(self, function: Callable, *args, **kwargs) -> Any:
+        """
+        Run a write on the writer thread and wait for it to be committed.
+        :param function: Callable performing the write
+        :returns: The callable's result
+        """
+        return self.submit(function, *args, **kwargs).result()
+
+    def close(self):
+        """Finish the queued writes, stop the writer thread and close its connection."""
+        with self._close_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+
+            batch = [job]
+            stop = False
+            while len(batch) < self.max_batch_size:
+                try:
+                    job = self._queue.get_nowait()
+                except Empty:
+                    break
+                if job is None:
+                    stop = True
+                    break
+                batch.append(job)
+
+            self._write_batch(batch)
+            if stop:
+                break
+
+        if not self.database.is_closed():
+            self.database.close()
+
+    def _write_batch(self, batch: List[Tuple[Future, Callable, tuple, dict]]):
+        results = []
+        try:
+            with self.database.atomic():
+                for future, function, args, kwargs in batch:
+                    try:
+                        # Each write gets its own savepoint so one failure does not undo the others
+                        with self.database.atomic():
+                            results.append((future, function(*args, **kwargs), None))
+                    except Exception as e:
+                        results.append((future, None, e))
+        except Exception as e:
+            for future, _, _, _ in batch:
+                future.set_exception(e)
+            return
+
+        if self.on_commit is not None:
+            self.on_commit()
+
+        for future, result, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
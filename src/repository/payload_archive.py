@@ -0,0 +1,158 @@
+import hashlib
+import json
+from datetime import datetime
+from threading import Lock
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import zstandard
+from peewee import SqliteDatabase, SQL, fn
+
+from src.models.raw_payload import PayloadDictionary, RawPayload, PayloadObservation
+
+
+class PayloadArchive:
+    """Content-addressed, dictionary-compressed archive of raw product payloads."""
+    _models = [PayloadDictionary, RawPayload, PayloadObservation]
+
+    def __init__(self, db_path: str, dictionary_size: int = 64 * 1024, train_after: int = 200,
+                 compression_level: int = 10):
+        self.database = SqliteDatabase(db_path, pragmas={
+            'journal_mode': 'wal',
+            'synchronous': 'normal',
+            'busy_timeout': 30000,
+        })
+        self.database.bind(self._models)
+        self.database.create_tables(self._models, safe=True)
+        self.dictionary_size = dictionary_size
+        self.train_after = train_after
+        self.compression_level = compression_level
+        self._lock = Lock()
+        self._compressor: Optional[zstandard.ZstdCompressor] = None
+        self._dictionary_id = 0
+        self._decompressors: Dict[int, zstandard.ZstdDecompressor] = {}
+        self._load_latest_dictionary()
+
+    def _load_latest_dictionary(self):
+        latest = PayloadDictionary.select().order_by(PayloadDictionary.id.desc()).first()
+        if latest is None:
+            self._dictionary_id = 0
+            self._compressor = zstandard.ZstdCompressor(level=self.compression_level)
+        else:
+            self._dictionary_id = latest.id
+            dictionary = zstandard.ZstdCompressionDict(bytes(latest.data))
+            self._compressor = zstandard.ZstdCompressor(level=self.compression_level, dict_data=dictionary)
+
+    def _decompressor(self, dictionary_id: int) -> zstandard.ZstdDecompressor:
+        if dictionary_id not in self._decompressors:
+            if dictionary_id == 0:
+                self._decompressors[0] = zstandard.ZstdDecompressor()
+            else:
+                data = PayloadDictionary.get_by_id(dictionary_id).data
+                dictionary = zstandard.ZstdCompressionDict(bytes(data))
+                self._decompressors[dictionary_id] = zstandard.ZstdDecompressor(dict_data=dictionary)
+        return self._decompressors[dictionary_id]
+
+    @staticmethod
+    def _canonical_bytes(payload: Dict[str, Any]) -> bytes:
+        return json.dumps(payload, sort_keys=True, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+    def store(self, store: str, stockcode: str, date: str, payload: Dict[str, Any]) -> str:
+        """
+        Archive a payload, storing its content only once however many days it was seen.
+        :param store: The store name
+        :param stockcode: The product's ID/stockcode
+        :param date: Date the payload was fetched, in YYYY-MM-DD format
+        :param payload: Extracted product payload
+        :returns: The payload's content hash
+        """
+        raw = self._canonical_bytes(payload)
+        content_hash = hashlib.sha256(raw).hexdigest()
+
+        with self._lock, self.database.atomic():
+            if not RawPayload.select().where(RawPayload.content_hash == content_hash).exists():
+                RawPayload.create(content_hash=content_hash, dictionary_id=self._dictionary_id, size=len(raw),
+                                  data=self._compressor.compress(raw))
+            (PayloadObservation
+             .insert(store=store, stockcode=stockcode, date=date, content_hash=content_hash)
+             .on_conflict_replace()
+             .execute())
+
+        if self._dictionary_id == 0 and self.train_after and RawPayload.select().count() >= self.train_after:
+            self.train_dictionary()
+        return content_hash
+
+    def train_dictionary(self, sample_count: int = 1000) -> int:
+        """
+        Train a new shared dictionary from the most recent payloads and use it for new payloads.
+        Existing payloads keep the dictionary they were compressed with.
+        :param sample_count: Maximum number of payloads to train on
+        :returns: Id of the new dictionary
+        """
+        with self._lock:
+            samples = [self._decompress(payload) for payload in
+                       RawPayload.select().order_by(SQL('rowid').desc()).limit(sample_count)]
+            dictionary = zstandard.train_dictionary(self.dictionary_size, samples)
+            with self.database.atomic():
+                created = PayloadDictionary.create(data=dictionary.as_bytes(), sample_count=len(samples),
+                                                   created=datetime.now().strftime('%Y-%m-%d'))
+            self._load_latest_dictionary()
+            return created.id
+
+    def _decompress(self, payload: RawPayload) -> bytes:
+        return self._decompressor(payload.dictionary_id).decompress(bytes(payload.data), max_output_size=payload.size)
+
+    def load(self, content_hash: str) -> Dict[str, Any]:
+        """
+        Load a payload by its content hash.
+        :param content_hash: The payload's content hash
+        :returns: The payload
+        """
+        return json.loads(self._decompress(RawPayload.get_by_id(content_hash)))
+
+    def iter_payloads(self, start_date: Optional[str] = None,
+                      end_date: Optional[str] = None) -> Iterator[Tuple[str, str, str, Dict[str, Any]]]:
+        """
+        Iterate over archived observations and their payloads, decompressing each unique payload once.
+        :param start_date: Inclusive start date in YYYY-MM-DD format, or None for no lower bound
+        :param end_date: Inclusive end date in YYYY-MM-DD format, or None for no upper bound
+        :returns: Iterator of (store, stockcode, date, payload) tuples
+        """
+        query = (PayloadObservation
+                 .select(PayloadObservation.store, PayloadObservation.stockcode, PayloadObservation.date,
+                         RawPayload.dictionary_id, RawPayload.size, RawPayload.data, RawPayload.content_hash)
+                 .join(RawPayload, on=(PayloadObservation.content_hash == RawPayload.content_hash))
+                 .order_by(PayloadObservation.content_hash, PayloadObservation.date))
+        if start_date:
+            query = query.where(PayloadObservation.date >= start_date)
+        if end_date:
+            query = query.where(PayloadObservation.date <= end_date)
+
+        last_hash, payload = None, None
+        for store, stockcode, date, dictionary_id, size, data, content_hash in query.tuples():
+            if content_hash != last_hash:
+                raw = self._decompressor(dictionary_id).decompress(bytes(data), max_output_size=size)
+                payload = json.loads(raw)
+                last_hash = content_hash
+            yield store, stockcode, date, payload
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get archive size statistics.
+        :returns: Dictionary with observation and unique payload counts and raw and compressed sizes.
+        """
+        raw_size, compressed_size = (RawPayload
+                                     .select(fn.COALESCE(fn.SUM(RawPayload.size), 0),
+                                             fn.COALESCE(fn.SUM(fn.LENGTH(RawPayload.data)), 0))
+                                     .scalar(as_tuple=True))
+        return {
+            "observations": PayloadObservation.select().count(),
+            "payloads": RawPayload.select().count(),
+            "raw_bytes": raw_size,
+            "compressed_bytes": compressed_size,
+            "dictionaries": PayloadDictionary.select().count(),
+        }
+
+    def close(self):
+        """Close the archive database connection."""
+        if not self.database.is_closed():
+            self.database.close()
@@ -0,0 +1,120 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from peewee import chunked
+
+from src.models.price_alert import AlertRule, PriceAlert, ProductPriceStats
+from src.models.product_record import ProductRecord
+
+
+class PriceAlertEngine:
+    """Evaluates alert rules against newly saved observations using running per-product price statistics."""
+
+    def rebuild_stats(self, products: Iterable[ProductRecord]):
+        """
+        Rebuild the per-product price statistics from the full history.
+        :param products: Every stored observation
+        """
+        stats: Dict[Tuple[str, str], Dict] = {}
+        for product in sorted(products):
+            key = (product.store.lower(), product.stockcode)
+            self._update_stats(stats, key, product)
+
+        ProductPriceStats.delete().execute()
+        for batch in chunked(stats.values(), 100):
+            ProductPriceStats.insert_many(batch).execute()
+
+    def evaluate(self, products: List[ProductRecord]) -> int:
+        """
+        Evaluate the enabled rules against a batch of new observations, persist fired alerts
+        and update the price statistics. Cost scales with the batch size, not the history size.
+        :param products: Newly saved observations
+        :returns: Number of new alerts stored for this batch
+        """
+        if not products:
+            return 0
+
+        rules = list(AlertRule.select().where(AlertRule.enabled == True))  # noqa: E712
+        stats = self._load_stats({(product.store.lower(), product.stockcode) for product in products})
+        alerts = []
+
+        for product in sorted(products):
+            key = (product.store.lower(), product.stockcode)
+            previous = stats.get(key)
+            # Back-filled history older than the latest observation only updates the statistics
+            if previous is None or product.date > previous["last_date"]:
+                for rule in rules:
+                    message = self._check_rule(rule, product, previous)
+                    if message:
+                        alerts.append(dict(
+                            rule_id=rule.id, rule_name=rule.name, date=product.date, store=product.store,
+                            stockcode=product.stockcode, product_name=product.product_name,
+                            price=product.price, message=message,
+                        ))
+            self._update_stats(stats, key, product)
+
+        for batch in chunked(stats.values(), 100):
+            ProductPriceStats.insert_many(batch).on_conflict(
+                conflict_target=[ProductPriceStats.store, ProductPriceStats.stockcode],
+                preserve=[ProductPriceStats.last_date, ProductPriceStats.last_price,
+                          ProductPriceStats.min_price, ProductPriceStats.max_price],
+            ).execute()
+        inserted = 0
+        for batch in chunked(alerts, 100):
+            # Alerts already fired for the same rule, date and product are ignored and not counted
+            inserted += PriceAlert.insert_many(batch).on_conflict_ignore().as_rowcount().execute()
+
+        return inserted
+
+    @staticmethod
+    def _load_stats(keys: set) -> Dict[Tuple[str, str], Dict]:
+        stats = {}
+        stockcodes = sorted({stockcode for _, stockcode in keys})
+        for stockcode_batch in chunked(stockcodes, 500):
+            query = (ProductPriceStats
+                     .select(ProductPriceStats.store, ProductPriceStats.stockcode, ProductPriceStats.last_date,
+                             ProductPriceStats.last_price, ProductPriceStats.min_price, ProductPriceStats.max_price)
+                     .where(ProductPriceStats.stockcode.in_(stockcode_batch))
+                     .dicts())
+            for row in query:
+                key = (row["store"], row["stockcode"])
+                if key in keys:
+                    stats[key] = row
+        return stats
+
+    @staticmethod
+    def _update_stats(stats: Dict[Tuple[str, str], Dict], key: Tuple[str, str], product: ProductRecord):
+        current = stats.get(key)
+        if current is None:
+            stats[key] = dict(store=key[0], stockcode=key[1], last_date=product.date, last_price=product.price,
+                              min_price=product.price, max_price=product.price)
+            return
+        if product.date >= current["last_date"]:
+            current["last_date"] = product.date
+            current["last_price"] = product.price
+        current["min_price"] = min(current["min_price"], product.price)
+        current["max_price"] = max(current["max_price"], product.price)
+
+    @staticmethod
+    def _check_rule(rule: AlertRule, product: ProductRecord, previous: Optional[Dict]) -> Optional[str]:
+        if rule.store and rule.store.lower() != product.store.lower():
+            return None
+        if rule.stockcode and rule.stockcode != product.stockcode:
+            return None
+
+        if rule.rule_type == AlertRule.BELOW_PRICE:
+            if rule.threshold is not None and product.price < rule.threshold:
+                return f"{product.product_name} is ${product.price}, below ${rule.threshold}"
+        elif rule.rule_type == AlertRule.ALL_TIME_LOW:
+            if previous is not None and product.price < previous["min_price"]:
+                return f"{product.product_name} is at a new all-time low of ${product.price} " \
+                       f"(previous low ${previous['min_price']})"
+        elif rule.rule_type == AlertRule.HALF_PRICE:
+            if product.is_half_price:
+                return f"{product.product_name} is half price at ${product.price}"
+        elif rule.rule_type == AlertRule.PRICE_RISE_PERCENT:
+            if previous is not None and previous["last_price"] > 0 and rule.threshold is not None:
+                rise = (product.price - previous["last_price"]) / previous["last_price"] * 100
+                if rise > rule.threshold:
+                    return f"{product.product_name} rose {rise:.1f}% from ${previous['last_price']} " \
+                           f"to ${product.price}"
+        return None
@@ -0,0 +1,143 @@
+import os
+from typing import Dict, Iterable, List, Optional
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from src.models.product_record import ProductRecord
+
+
+class ProductArchive:
+    """Month-partitioned Parquet archive for historical product observations."""
+
+    _partition_prefix = "month="
+    _partition_file = "products.parquet"
+
+    schema = pa.schema([
+        ("date", pa.string()),
+        ("stockcode", pa.string()),
+        ("product_name", pa.string()),
+        ("price", pa.float64()),
+        ("is_on_special", pa.bool_()),
+        ("is_half_price", pa.bool_()),
+        ("was_price", pa.float64()),
+        ("savings_amount", pa.float64()),
+        ("package_size", pa.string()),
+        ("unit_weight_in_grams", pa.float64()),
+        ("cup_price", pa.float64()),
+        ("cup_measure", pa.string()),
+        ("cup_string", pa.string()),
+        ("store", pa.string()),
+    ])
+
+    def __init__(self, archive_dir: str):
+        self.archive_dir = archive_dir
+        os.makedirs(self.archive_dir, exist_ok=True)
+
+    def _partition_path(self, month: str) -> str:
+        return os.path.join(self.archive_dir, f"{self._partition_prefix}{month}", self._partition_file)
+
+    def months(self) -> List[str]:
+        """
+        List the archived months.
+        :returns: Sorted list of months in YYYY-MM format.
+        """
+        months = []
+        for entry in os.listdir(self.archive_dir):
+            if entry.startswith(self._partition_prefix) and os.path.exists(
+                    os.path.join(self.archive_dir, entry, self._partition_file)):
+                months.append(entry[len(self._partition_prefix):])
+        return sorted(months)
+
+    def version(self) -> tuple:
+        """
+        Fingerprint of the archive that changes whenever a partition is written, by any process.
+        :returns: Tuple of (month, inode, size, modification time) for every partition file.
+        """
+        stamps = []
+        for month in self.months():
+            stat = os.stat(self._partition_path(month))
+            stamps.append((month, stat.st_ino, stat.st_size, stat.st_mtime_ns))
+        return tuple(stamps)
+
+    def write_records(self, records: Iterable[ProductRecord]) -> int:
+        """
+        Append records to their month partitions, replacing duplicate (date, stockcode, store) rows.
+        :param records: Records to archive
+        :returns: Number of records written
+        """
+        by_month: Dict[str, List[ProductRecord]] = {}
+        for record in records:
+            by_month.setdefault(record.date[:7], []).append(record)
+
+        written = 0
+        for month, month_records in by_month.items():
+            path = self._partition_path(month)
+            merged = {(r.date, r.stockcode, r.store): r for r in self._read_partition_records(path)}
+            for record in month_records:
+                merged[(record.date, record.stockcode, record.store)] = record
+            self._write_partition(path, sorted(merged.values()))
+            written += len(month_records)
+
+        return written
+
+    def _write_partition(self, path: str, records: List[ProductRecord]):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        columns = list(zip(*records)) if records else [[] for _ in ProductRecord._fields]
+        table = pa.Table.from_arrays([pa.array(column, type=field.type)
+                                      for column, field in zip(columns, self.schema)], schema=self.schema)
+        # Write to a temporary file first so a partition is never left half written
+        tmp_path = f"{path}.tmp"
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, path)
+
+    def _read_partition_records(self, path: str) -> List[ProductRecord]:
+        if not os.path.exists(path):
+            return []
+        return self._table_to_records(pq.read_table(path, memory_map=True))
+
+    def read_table(self, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                   columns: Optional[List[str]] = None, predicate: Optional[pc.Expression] = None) -> pa.Table:
+        """
+        Read archived rows, pruning partitions outside the date range.
+        :param start_date: Inclusive start date in YYYY-MM-DD format, or None for no lower bound
+        :param end_date: Inclusive end date in YYYY-MM-DD format, or None for no upper bound
+        :param columns: Columns to read, or None for all columns
+        :param predicate: Optional row filter pushed down into the Parquet reader
+        :returns: Arrow table of the matching rows
+        """
+        read_columns = list(columns) if columns else list(self.schema.names)
+        filter_columns = read_columns if "date" in read_columns else read_columns + ["date"]
+        tables = []
+
+        for month in self.months():
+            if start_date and month < start_date[:7]:
+                continue
+            if end_date and month > end_date[:7]:
+                continue
+            table = pq.read_table(self._partition_path(month), columns=filter_columns, filters=predicate,
+                                  memory_map=True)
+            if start_date and month == start_date[:7]:
+                table = table.filter(pc.greater_equal(table["date"], start_date))
+            if end_date and month == end_date[:7]:
+                table = table.filter(pc.less_equal(table["date"], end_date))
+            tables.append(table.select(read_columns))
+
+        if not tables:
+            return self.schema.empty_table().select(read_columns)
+        return pa.concat_tables(tables)
+
+    def read_records(self, start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[ProductRecord]:
+        """
+        Read archived records within a date range.
+        :param start_date: Inclusive start date in YYYY-MM-DD format, or None for no lower bound
+        :param end_date: Inclusive end date in YYYY-MM-DD format, or None for no upper bound
+        :returns: List of ProductRecord instances
+        """
+        return self._table_to_records(self.read_table(start_date, end_date))
+
+    @staticmethod
+    def _table_to_records(table: pa.Table) -> List[ProductRecord]:
+        columns = [table.column(name).to_pylist() for name in ProductRecord._fields]
+        return [ProductRecord._make(row) for row in zip(*columns)]
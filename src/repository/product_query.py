@@ -0,0 +1,62 @@
+from collections import namedtuple
+from functools import lru_cache
+from typing import FrozenSet, Iterable, NamedTuple, Optional, Tuple
+
+from src.models.product_record import ProductRecord
+
+
+class ProductQuery(NamedTuple):
+    """
+    Immutable, composable description of a product query.
+    Every filter left as None is not applied. Columns default to all ProductRecord fields.
+    """
+    stores: Optional[FrozenSet[str]] = None
+    stockcodes: Optional[FrozenSet[str]] = None
+    product_names: Optional[FrozenSet[str]] = None
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+    on_special: Optional[bool] = None
+    columns: Optional[Tuple[str, ...]] = None
+
+    def for_stores(self, stores: Iterable[str]) -> "ProductQuery":
+        """Only match these stores (case-insensitive)."""
+        return self._replace(stores=frozenset(store.lower() for store in stores))
+
+    def for_stockcodes(self, stockcodes: Iterable[str]) -> "ProductQuery":
+        """Only match these stockcodes."""
+        return self._replace(stockcodes=frozenset(stockcodes))
+
+    def for_product_names(self, product_names: Iterable[str]) -> "ProductQuery":
+        """Only match these product names."""
+        return self._replace(product_names=frozenset(product_names))
+
+    def between(self, start_date: Optional[str] = None, end_date: Optional[str] = None) -> "ProductQuery":
+        """Only match observations within an inclusive YYYY-MM-DD date range."""
+        return self._replace(start_date=start_date or None, end_date=end_date or None)
+
+    def on_special_only(self, on_special: Optional[bool] = True) -> "ProductQuery":
+        """Only match observations that are (or are not) on special."""
+        return self._replace(on_special=on_special)
+
+    def select(self, *columns: str) -> "ProductQuery":
+        """Only return these columns."""
+        unknown = set(columns) - set(ProductRecord._fields)
+        if unknown:
+            raise ValueError(f"Unknown product columns: {', '.join(sorted(unknown))}")
+        return self._replace(columns=tuple(columns))
+
+    @property
+    def selected_columns(self) -> Tuple[str, ...]:
+        """Columns returned by the query."""
+        return self.columns or ProductRecord._fields
+
+    def row_type(self) -> type:
+        """Row type returned by the query: ProductRecord for all columns, otherwise a named tuple of the columns."""
+        if self.columns is None or self.columns == ProductRecord._fields:
+            return ProductRecord
+        return _row_type(self.columns)
+
+
+@lru_cache(maxsize=None)
+def _row_type(columns: Tuple[str, ...]) -> type:
+    return namedtuple("ProductRow", columns)
@@ -1,60 +1,481 @@
-from typing import List, Dict
+import os
+import sqlite3
+import threading
+from functools import reduce
+from datetime import datetime, timedelta
+from typing import Any, Callable, List, Dict, Iterable, NamedTuple, Optional, Tuple
 
-from peewee import SqliteDatabase
-from playhouse.shortcuts import model_to_dict
+import pyarrow as pa
+import pyarrow.compute as pc
+from peewee import SqliteDatabase, chunked
+from src.models.price_alert import AlertRule, PriceAlert, ProductPriceStats
 from src.models.product import Product
+from src.models.product_record import ProductRecord
+from src.models.stockcode_status import StockcodeStatus
+from src.repository.database_writer import DatabaseWriter
+from src.repository.price_alert_engine import PriceAlertEngine
+from src.repository.product_archive import ProductArchive
+from src.repository.product_query import ProductQuery
+from src.repository.query_cache import QueryCache
 from src.tools.path_tools import get_writable_db_path
 
 
+class SaveResult(NamedTuple):
+    """Outcome of saving a batch of products."""
+    saved: int
+    alerts: int
+
+
 class ProductRepository:
     """Repository to manage the Product model with SQLite."""
+    missing_retry_max_days = 32
+    retire_after_days = 90
+    _models = [Product, StockcodeStatus, AlertRule, PriceAlert, ProductPriceStats]
+    # Columns identifying one observation; a row may briefly exist in both SQLite and the archive
+    _row_key = ("date", "stockcode", "store")
 
-    def __init__(self):
+    def __init__(self, cache_size: int = 64, archive_horizon_days: int = 365):
         db_path = get_writable_db_path(db_name="products.db", db_dir="resources/database")
-        self.database = SqliteDatabase(db_path)
+        # Connections are per thread; WAL lets readers keep a snapshot while the writer commits
+        self.database = SqliteDatabase(db_path, pragmas={
+            'journal_mode': 'wal',
+            'synchronous': 'normal',
+            'busy_timeout': 30000,
+        })
+        self.query_cache = QueryCache(max_entries=cache_size)
+        self.database_dir = os.path.dirname(db_path)
+        self.archive = ProductArchive(os.path.join(self.database_dir, "archive"))
+        self.archive_horizon_days = archive_horizon_days
+        self.alert_engine = PriceAlertEngine()
         self._initialize_database()
+        self.writer = DatabaseWriter(self.database, on_commit=self.query_cache.bump_generation)
+        # PRAGMA data_version is per connection, so one shared connection is used to detect
+        # commits made by other processes (the scheduler, payload reprocessing, another GUI)
+        self._version_connection = sqlite3.connect(db_path, check_same_thread=False)
+        self._version_lock = threading.Lock()
 
     def _initialize_database(self):
-        """Bind the Product model to the database and create tables."""
-        self.database.bind([Product])
+        """Bind the models to the database and create tables."""
+        self.database.bind(self._models)
         self.database.connect()
-        self.database.create_tables([Product], safe=True)
+        self.database.create_tables(self._models, safe=True)
+
+        # Build the running price statistics used by the alert rules from the existing history once
+        if not ProductPriceStats.select().exists() and (Product.select().exists() or self.archive.months()):
+            with self.database.atomic():
+                fields = [Product._meta.fields[name] for name in ProductRecord._fields]
+                history = [ProductRecord._make(row) for row in Product.select(*fields).tuples()]
+                self.alert_engine.rebuild_stats(history + self.archive.read_records())
+
+    def _cached_read(self, query: str, params: Tuple, load: Callable[[], Any]) -> Any:
+        """Run a read query through the query cache inside a snapshot transaction."""
+        def load_snapshot() -> Any:
+            with self.database.atomic():
+                return load()
+
+        self.query_cache.sync_source_version(self._source_version())
+        return self.query_cache.get_or_load(query, params, load_snapshot)
+
+    def _source_version(self) -> Tuple:
+        """Fingerprint of the database and the archive, changing on any commit or archive write."""
+        with self._version_lock:
+            data_version = self._version_connection.execute("PRAGMA data_version").fetchone()[0]
+        return data_version, self.archive.version()
 
-    def save_product(self, product: Product):
+    def save_product(self, product: ProductRecord) -> bool:
         """
         Save a product to the database.
-        :param product: Product instance containing product details.
+        :param product: ProductRecord containing product details.
+        :returns: True if a new row was saved, False if the product was already saved for that date.
         """
-        with self.database.atomic():
-            Product.get_or_create(
-                date=product.date,
-                stockcode=product.stockcode,
-                store=product.store,
-                defaults=model_to_dict(product, exclude=[Product.id])
-            )
+        return self.writer.execute(self._save_product, product)
 
-    @staticmethod
-    def get_all_stockcodes_by_store() -> Dict[str, List[str]]:
+    def _save_product(self, product: ProductRecord) -> bool:
+        _, created = Product.get_or_create(
+            date=product.date,
+            stockcode=product.stockcode,
+            store=product.store,
+            defaults=product.to_dict()
+        )
+        if created:
+            self.alert_engine.evaluate([product])
+        self._mark_active(product.store, [product.stockcode])
+        return created
+
+    def save_products(self, products: Iterable[ProductRecord], batch_size: int = 100) -> SaveResult:
+        """
+        Save many products in a single transaction.
+        Rows already stored for the same date, stockcode and store are skipped, and rows older than the
+        archive horizon are written straight to the archive.
+        :param products: ProductRecords to save.
+        :param batch_size: Number of rows per INSERT statement.
+        :returns: SaveResult with the number of new rows saved and new price alerts fired.
+        """
+        return self.writer.execute(self._save_products, list(products), batch_size)
+
+    def _save_products(self, products: List[ProductRecord], batch_size: int) -> SaveResult:
+        pending: Dict[Tuple[str, str, str], ProductRecord] = {}
+        for product in products:
+            pending.setdefault((product.date, product.stockcode, product.store), product)
+
+        if not pending:
+            return SaveResult(saved=0, alerts=0)
+
+        dates = [date for date, _, _ in pending]
+        stockcodes = sorted({stockcode for _, stockcode, _ in pending})
+        for stockcode_batch in chunked(stockcodes, 500):
+            query = (Product
+                     .select(Product.date, Product.stockcode, Product.store)
+                     .where(Product.stockcode.in_(stockcode_batch) &
+                            Product.date.between(min(dates), max(dates)))
+                     .tuples())
+            for existing in query:
+                pending.pop(existing, None)
+
+        # Rows older than the archive horizon may already live in the archive
+        archived = self.archive.read_table(min(dates), max(dates), columns=["date", "stockcode", "store"])
+        for existing in zip(archived["date"].to_pylist(), archived["stockcode"].to_pylist(),
+                            archived["store"].to_pylist()):
+            pending.pop(existing, None)
+
+        cutoff = self._archive_cutoff()
+        recent = (product.to_dict() for product in pending.values() if product.date >= cutoff)
+        for batch in chunked(recent, batch_size):
+            Product.insert_many(batch).execute()
+
+        alerts = self.alert_engine.evaluate(list(pending.values()))
+        # Historical rows skip the SQLite round trip through archive_old_products
+        historical = [product for product in pending.values() if product.date < cutoff]
+        if historical:
+            self.archive.write_records(historical)
+        return SaveResult(saved=len(pending), alerts=alerts)
+
+    def archive_old_products(self, horizon_days: Optional[int] = None) -> int:
+        """
+        Move observations older than the archive horizon from SQLite into the Parquet archive.
+        :param horizon_days: Age in days after which rows are archived, defaults to archive_horizon_days
+        :returns: Number of rows archived
+        """
+        return self.writer.execute(self._archive_products_before, self._archive_cutoff(horizon_days))
+
+    def _archive_cutoff(self, horizon_days: Optional[int] = None) -> str:
+        """First date kept in SQLite; older observations belong in the archive."""
+        if horizon_days is None:
+            horizon_days = self.archive_horizon_days
+        return (datetime.now() - timedelta(days=horizon_days)).strftime('%Y-%m-%d')
+
+    def _archive_products_before(self, cutoff: str) -> int:
+        fields = [Product._meta.fields[name] for name in ProductRecord._fields]
+        query = Product.select(*fields).where(Product.date < cutoff).tuples()
+        old_products = [ProductRecord._make(row) for row in query]
+        if not old_products:
+            return 0
+        # Only delete from SQLite once the archive write has succeeded
+        self.archive.write_records(old_products)
+        Product.delete().where(Product.date < cutoff).execute()
+        return len(old_products)
+
+    def get_all_stockcodes_by_store(self, include_retired: bool = False) -> Dict[str, List[str]]:
         """
-        Retrieve all unique stock codes grouped by store from the Product table.
+        Retrieve all unique stock codes grouped by store from the Product table and the archive.
+        Retired stockcodes and missing stockcodes that are not yet due for a retry are skipped.
+        :param include_retired: Include retired and backed-off missing stockcodes.
         :returns: Dictionary with store names as keys and lists of unique stock codes as values.
         """
-        query = Product.select(Product.store, Product.stockcode).distinct()
-        store_stockcodes = {}
+        all_stockcodes = self._get_all_stockcodes_by_store()
+        if include_retired:
+            return all_stockcodes
+
+        skipped = self._get_skipped_stockcodes(datetime.now().strftime('%Y-%m-%d'))
+        return {store: [stockcode for stockcode in stockcodes if (store.lower(), stockcode) not in skipped]
+                for store, stockcodes in all_stockcodes.items()}
+
+    def _get_skipped_stockcodes(self, today: str) -> frozenset:
+        def load() -> frozenset:
+            query = (StockcodeStatus
+                     .select(StockcodeStatus.store, StockcodeStatus.stockcode)
+                     .where((StockcodeStatus.status == StockcodeStatus.RETIRED) |
+                            ((StockcodeStatus.status == StockcodeStatus.MISSING) &
+                             (StockcodeStatus.next_retry > today)))
+                     .tuples())
+            return frozenset(query)
+
+        return self._cached_read("skipped_stockcodes", (today,), load)
+
+    def _get_all_stockcodes_by_store(self) -> Dict[str, List[str]]:
+        def load() -> Dict[str, tuple]:
+            query = Product.select(Product.store, Product.stockcode).distinct()
+            store_stockcodes = {}
+
+            for store, stockcode in query.tuples():
+                store_stockcodes.setdefault(store, {})[stockcode] = None
+
+            archived = self.archive.read_table(columns=["store", "stockcode"])
+            for store, stockcode in zip(archived["store"].to_pylist(), archived["stockcode"].to_pylist()):
+                store_stockcodes.setdefault(store, {})[stockcode] = None
+
+            return {store: tuple(stockcodes) for store, stockcodes in store_stockcodes.items()}
+
+        cached = self._cached_read("stockcodes_by_store", (), load)
+        return {store: list(stockcodes) for store, stockcodes in cached.items()}
+
+    def record_fetch_results(self, fetched: Dict[str, List[str]], missing: Dict[str, List[str]],
+                             today: Optional[str] = None):
+        """
+        Update the lifecycle status of stockcodes after an update run.
+        Fetched stockcodes become active again. Missing ones are retried on an exponential
+        schedule and retired once they have been missing for retire_after_days.
+        :param fetched: Dictionary mapping store names to stockcodes fetched successfully.
+        :param missing: Dictionary mapping store names to stockcodes that were not found.
+        :param today: Today's date in YYYY-MM-DD format, defaults to the current date.
+        """
+        today = today or datetime.now().strftime('%Y-%m-%d')
+        self.writer.execute(self._record_fetch_results, fetched, missing, today)
+
+    def _record_fetch_results(self, fetched: Dict[str, List[str]], missing: Dict[str, List[str]], today: str):
+        today_date = datetime.strptime(today, '%Y-%m-%d')
+
+        for store, stockcodes in fetched.items():
+            self._mark_active(store, stockcodes)
+
+        for store, stockcodes in missing.items():
+            for stockcode in stockcodes:
+                status, _ = StockcodeStatus.get_or_create(store=store.lower(), stockcode=stockcode)
+                if status.status == StockcodeStatus.ACTIVE:
+                    status.missing_since = today
+                    status.failure_count = 0
+                status.failure_count += 1
+
+                missing_days = (today_date - datetime.strptime(status.missing_since, '%Y-%m-%d')).days
+                if missing_days >= self.retire_after_days:
+                    status.status = StockcodeStatus.RETIRED
+                    status.next_retry = None
+                else:
+                    status.status = StockcodeStatus.MISSING
+                    retry_days = min(2 ** status.failure_count, self.missing_retry_max_days)
+                    status.next_retry = (today_date + timedelta(days=retry_days)).strftime('%Y-%m-%d')
+                status.save()
+
+    def reenable_stockcode(self, store: str, stockcode: str):
+        """
+        Mark a missing or retired stockcode as active so it is fetched again.
+        :param store: The store name.
+        :param stockcode: The product's ID/stockcode.
+        """
+        self.writer.execute(self._mark_active, store, [stockcode])
+
+    @staticmethod
+    def _mark_active(store: str, stockcodes: List[str]):
+        # Stores are spelt inconsistently across product rows, so statuses are keyed by the lower-cased name
+        for stockcode_batch in chunked(stockcodes, 500):
+            (StockcodeStatus
+             .update(status=StockcodeStatus.ACTIVE, missing_since=None, failure_count=0, next_retry=None)
+             .where((StockcodeStatus.store == store.lower()) &
+                    (StockcodeStatus.stockcode.in_(stockcode_batch)) &
+                    (StockcodeStatus.status != StockcodeStatus.ACTIVE))
+             .execute())
+
+    def get_stockcode_status_counts(self) -> Dict[str, int]:
+        """
+        Count tracked stockcodes by lifecycle status.
+        :returns: Dictionary with status names as keys and counts as values.
+        """
+        tracked = {(store.lower(), stockcode)
+                   for store, stockcodes in self._get_all_stockcodes_by_store().items()
+                   for stockcode in stockcodes}
+        counts = {StockcodeStatus.ACTIVE: len(tracked), StockcodeStatus.MISSING: 0, StockcodeStatus.RETIRED: 0}
+        query = (StockcodeStatus
+                 .select(StockcodeStatus.status)
+                 .where(StockcodeStatus.status != StockcodeStatus.ACTIVE)
+                 .tuples())
+        for (status,) in query:
+            counts[status] += 1
+            counts[StockcodeStatus.ACTIVE] -= 1
+        return counts
+
+    def get_all_products(self) -> List[ProductRecord]:
+        """
+        Retrieve all products from the database, including archived history.
+        :returns: List of ProductRecord instances.
+        """
+        return self.get_products_between()
 
-        for product in query:
-            store_stockcodes.setdefault(product.store, []).append(product.stockcode)
+    def get_products_between(self, start_date: Optional[str] = None,
+                             end_date: Optional[str] = None) -> List[ProductRecord]:
+        """
+        Retrieve products within a date range from the database and the archive.
+        :param start_date: Inclusive start date in YYYY-MM-DD format, or None for no lower bound
+        :param end_date: Inclusive end date in YYYY-MM-DD format, or None for no upper bound
+        :returns: List of ProductRecord instances, archived history first.
+        """
+        return self.query_products(ProductQuery().between(start_date, end_date))
+
+    def query_products(self, query: ProductQuery) -> List[tuple]:
+        """
+        Run a product query against the database and the archive.
+        The filters become indexed SQL WHERE clauses and Parquet row filters, and only the
+        selected columns are read.
+        :param query: ProductQuery describing the filters and columns.
+        :returns: List of ProductRecords, or named tuples of the selected columns, archived history first.
+        """
+        def load() -> tuple:
+            columns = query.selected_columns
+            row_type = query.row_type()
+            conditions, predicates = [], []
 
-        return store_stockcodes
+            if query.stores is not None:
+                # Stores are matched case-insensitively but compared exactly so the index can be used
+                stores = [store for store in self._get_all_stockcodes_by_store() if store.lower() in query.stores]
+                conditions.append(Product.store.in_(stores))
+                predicates.append(self._isin_predicate("store", stores))
+            if query.stockcodes is not None:
+                conditions.append(Product.stockcode.in_(sorted(query.stockcodes)))
+                predicates.append(self._isin_predicate("stockcode", query.stockcodes))
+            if query.product_names is not None:
+                conditions.append(Product.product_name.in_(sorted(query.product_names)))
+                predicates.append(self._isin_predicate("product_name", query.product_names))
+            if query.start_date:
+                conditions.append(Product.date >= query.start_date)
+            if query.end_date:
+                conditions.append(Product.date <= query.end_date)
+            if query.on_special is not None:
+                conditions.append(Product.is_on_special == query.on_special)
+                predicates.append(pc.field("is_on_special") == query.on_special)
+
+            # The row key is always read so rows present in both tiers can be dropped from the archive side
+            read_columns = list(dict.fromkeys(columns + self._row_key))
+            key_indexes = [read_columns.index(name) for name in self._row_key]
+            column_indexes = [read_columns.index(name) for name in columns]
+
+            select = Product.select(*[Product._meta.fields[name] for name in read_columns])
+            if conditions:
+                select = select.where(reduce(lambda a, b: a & b, conditions))
+            live_rows = list(select.tuples())
+            # Rows outlive their archive copy in SQLite when a delete fails after the archive write
+            live_keys = {tuple(row[i] for i in key_indexes) for row in live_rows}
+
+            archived = self.archive.read_table(query.start_date, query.end_date, columns=read_columns,
+                                               predicate=reduce(lambda a, b: a & b, predicates) if predicates else None)
+            rows = [row_type._make(row[i] for i in column_indexes)
+                    for row in zip(*(archived[name].to_pylist() for name in read_columns))
+                    if not live_keys or tuple(row[i] for i in key_indexes) not in live_keys]
+            rows.extend(row_type._make(row[i] for i in column_indexes) for row in live_rows)
+            return tuple(rows)
+
+        return list(self._cached_read("query_products", (query,), load))
 
     @staticmethod
-    def get_all_products() -> List[Product]:
+    def _isin_predicate(column: str, values: Iterable[str]) -> pc.Expression:
+        """Build a Parquet membership filter; the value set is typed so that an empty set matches nothing."""
+        return pc.field(column).isin(pa.array(sorted(values), type=pa.string()))
+
+    def get_product_names_by_stockcode(self) -> Dict[Tuple[str, str], str]:
+        """
+        Retrieve the most recent product name for every stockcode.
+        :returns: Dictionary keyed by (lower-cased store, stockcode) with product names as values.
+        """
+        def load() -> Dict[Tuple[str, str], str]:
+            names = {}
+            archived = self.archive.read_table(columns=["date", "store", "stockcode", "product_name"])
+            archived = archived.sort_by("date")
+            for store, stockcode, name in zip(archived["store"].to_pylist(), archived["stockcode"].to_pylist(),
+                                              archived["product_name"].to_pylist()):
+                names[(store.lower(), stockcode)] = name
+
+            query = (Product
+                     .select(Product.store, Product.stockcode, Product.product_name)
+                     .order_by(Product.date)
+                     .tuples())
+            for store, stockcode, name in query:
+                names[(store.lower(), stockcode)] = name
+            return names
+
+        return dict(self._cached_read("product_names_by_stockcode", (), load))
+
+    def get_all_product_names(self) -> List[str]:
+        """
+        Retrieve all unique product names, sorted alphabetically.
+        :returns: List of product names.
+        """
+        def load() -> tuple:
+            query = Product.select(Product.product_name).distinct()
+            names = {name for (name,) in query.tuples()}
+            names.update(self.archive.read_table(columns=["product_name"])["product_name"].to_pylist())
+            return tuple(sorted(names))
+
+        return list(self._cached_read("product_names", (), load))
+
+    def get_alert_rules(self) -> List[AlertRule]:
+        """
+        Retrieve all price alert rules.
+        :returns: List of AlertRule instances.
+        """
+        return list(self._cached_read("alert_rules", (), lambda: tuple(AlertRule.select().order_by(AlertRule.id))))
+
+    def add_alert_rule(self, name: str, rule_type: str, threshold: Optional[float] = None,
+                       store: Optional[str] = None, stockcode: Optional[str] = None) -> AlertRule:
+        """
+        Add a price alert rule evaluated against every newly saved observation.
+        :param name: Name of the rule.
+        :param rule_type: One of AlertRule.RULE_TYPES.
+        :param threshold: Price for below_price rules, percentage for price_rise_percent rules.
+        :param store: Only match this store, or None for all stores.
+        :param stockcode: Only match this stockcode, or None for all products.
+        :returns: The new AlertRule.
+        """
+        if rule_type not in AlertRule.RULE_TYPES:
+            raise ValueError(f"Unknown alert rule type '{rule_type}'.")
+        if rule_type in (AlertRule.BELOW_PRICE, AlertRule.PRICE_RISE_PERCENT) and threshold is None:
+            raise ValueError(f"A threshold is required for '{rule_type}' rules.")
+        return self.writer.execute(AlertRule.create, name=name, rule_type=rule_type, threshold=threshold,
+                                   store=store or None, stockcode=stockcode or None)
+
+    def delete_alert_rule(self, rule_id: int):
+        """
+        Delete a price alert rule. Alerts it already fired are kept.
+        :param rule_id: Id of the rule to delete.
+        """
+        self.writer.execute(lambda: AlertRule.delete_by_id(rule_id))
+
+    def get_price_alerts(self, include_acknowledged: bool = False, limit: int = 500) -> List[PriceAlert]:
+        """
+        Retrieve fired price alerts, newest first.
+        :param include_acknowledged: Include alerts that have already been acknowledged.
+        :param limit: Maximum number of alerts to return.
+        :returns: List of PriceAlert instances.
+        """
+        def load() -> tuple:
+            query = PriceAlert.select().order_by(PriceAlert.date.desc(), PriceAlert.id.desc()).limit(limit)
+            if not include_acknowledged:
+                query = query.where(PriceAlert.acknowledged == False)  # noqa: E712
+            return tuple(query)
+
+        return list(self._cached_read("price_alerts", (include_acknowledged, limit), load))
+
+    def acknowledge_price_alerts(self, alert_ids: Optional[List[int]] = None):
+        """
+        Mark price alerts as acknowledged.
+        :param alert_ids: Ids of the alerts to acknowledge, or None for all alerts.
+        """
+        def acknowledge():
+            query = PriceAlert.update(acknowledged=True)
+            if alert_ids is not None:
+                query = query.where(PriceAlert.id.in_(alert_ids))
+            query.execute()
+
+        self.writer.execute(acknowledge)
+
+    def get_cache_stats(self) -> Dict[str, int]:
         """
-        Retrieve all products from the database.
-        :returns: List of Product instances.
+        Get hit and miss statistics for the query cache.
+        :returns: Dictionary with hits, misses, size and write generation.
         """
-        return list(Product.select())
+        return self.query_cache.stats()
 
     def close(self):
-        """Close the database connection."""
-        self.database.close()
+        """Stop the writer and close this thread's database connection."""
+        self.writer.close()
+        with self._version_lock:
+            self._version_connection.close()
+        if not self.database.is_closed():
+            self.database.close()
@@ -0,0 +1,88 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class QueryCache:
+    """Size-bounded LRU cache for repository query results, invalidated by a write generation counter."""
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[Hashable, ...], Any]" = OrderedDict()
+        self._generation = 0
+        self._source_version: Hashable = None
+        self._hits = 0
+        self._misses = 0
+        self._lock = Lock()
+
+    @property
+    def generation(self) -> int:
+        """Current write generation."""
+        return self._generation
+
+    def bump_generation(self):
+        """Invalidate all cached results after a write to the database."""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def sync_source_version(self, version: Hashable):
+        """
+        Invalidate all cached results if the underlying data changed outside this process's writer.
+        :param version: Hashable fingerprint of the data sources, e.g. the SQLite data_version
+        """
+        with self._lock:
+            if version != self._source_version:
+                self._source_version = version
+                self._generation += 1
+                self._entries.clear()
+
+    def get_or_load(self, query: str, params: Tuple[Hashable, ...], loader: Callable[[], Any]) -> Any:
+        """
+        Return the cached result for a query, loading and caching it on a miss.
+        :param query: Name identifying the query
+        :param params: Hashable query parameters
+        :param loader: Callable that runs the query against the database
+        :returns: The query result
+        """
+        with self._lock:
+            generation = self._generation
+            key = (query, params)
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return self._entries[key]
+            self._misses += 1
+
+        result = loader()
+
+        with self._lock:
+            # Drop the result if a write landed while the query was running
+            if generation == self._generation:
+                self._entries[key] = result
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+        return result
+
+    def clear(self):
+        """Remove all cached results and reset the statistics."""
+        with self._lock:
+            self._entries.clear()
+            self._hits = 0
+            self._misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get cache hit and miss statistics.
+        :returns: Dictionary with hits, misses, current size and write generation.
+        """
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "generation": self._generation,
+            }
@@ -1,6 +1,6 @@
 from typing import Optional, Dict, Any
 
-from src.models.product import Product
+from src.models.product_record import ProductRecord
 from src.service.product_base_service import ProductBaseService
 
 
@@ -20,6 +20,6 @@ class ColesService(ProductBaseService):
         # TODO - Not implemented yet
         pass
 
-    def _map_product_data(self, product_data: Dict[str, Any], stockcode: str, today: str) -> Product:
+    def _map_product_data(self, product_data: Dict[str, Any], stockcode: str, today: str) -> ProductRecord:
         # TODO - Not implemented yet
         pass
@@ -0,0 +1,97 @@
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from threading import Lock
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class LookupCache:
+    """Size-bounded TTL cache that coalesces identical lookups already in flight."""
+
+    def __init__(self, ttl_seconds: float = 3600, max_entries: int = 256, clock: Callable[[], float] = time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._in_flight: Dict[Hashable, Future] = {}
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+        self._lock = Lock()
+
+    def get_or_fetch(self, key: Hashable, fetch: Callable[[], Any]) -> Any:
+        """
+        Return a fresh cached value, wait for an identical lookup in flight, or fetch the value.
+        Failed lookups are not cached; their exception is raised to every waiting caller.
+        :param key: Cache key
+        :param fetch: Callable that performs the lookup
+        :returns: The looked up value
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if self._clock() < entry[0]:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return entry[1]
+                del self._entries[key]
+
+            future = self._in_flight.get(key)
+            is_owner = future is None
+            if is_owner:
+                self._misses += 1
+                future = Future()
+                self._in_flight[key] = future
+            else:
+                self._coalesced += 1
+
+        if not is_owner:
+            return future.result()
+
+        try:
+            value = fetch()
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._store(key, value)
+            del self._in_flight[key]
+        future.set_result(value)
+        return value
+
+    def put(self, key: Hashable, value: Any):
+        """
+        Seed the cache with a known value.
+        :param key: Cache key
+        :param value: Value to cache
+        """
+        with self._lock:
+            self._store(key, value)
+
+    def _store(self, key: Hashable, value: Any):
+        self._entries[key] = (self._clock() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """Remove all cached values."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get cache statistics.
+        :returns: Dictionary with hits, misses, coalesced lookups and current size.
+        """
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "coalesced": self._coalesced,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+            }
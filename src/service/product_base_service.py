@@ -1,14 +1,23 @@
 from abc import ABC, abstractmethod
 from datetime import datetime
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, NamedTuple
 import httpx
 
-from src.models.product import Product
+from src.models.product_record import ProductRecord
+from src.repository.payload_archive import PayloadArchive
+
+
+class FetchResult(NamedTuple):
+    """Outcome of fetching a batch of stockcodes from a store."""
+    products: List[ProductRecord]
+    missing: List[str]
+    failed: List[str]
 
 
 class ProductBaseService(ABC):
     """Abstract base class for product services."""
     has_been_redirected = False
+    payload_archive: Optional[PayloadArchive] = None
 
     @property
     @abstractmethod
@@ -32,16 +41,34 @@ class ProductBaseService(ABC):
         pass
 
     @abstractmethod
-    def _map_product_data(self, product_data: Dict[str, Any], stockcode: str, today: str) -> Product:
+    def _map_product_data(self, product_data: Dict[str, Any], stockcode: str, today: str) -> ProductRecord:
         """
-        Map product data to the Product model.
+        Map product data to a ProductRecord.
         :param product_data: Dictionary containing product data
         :param stockcode: The product's ID/stockcode
         :param today: Today's date in YYYY-MM-DD format
-        :returns: Product object
+        :returns: ProductRecord
         """
         pass
 
+    def map_product_data(self, product_data: Dict[str, Any], stockcode: str, today: str) -> ProductRecord:
+        """
+        Map product data to a ProductRecord, e.g. when reprocessing archived payloads.
+        :param product_data: Dictionary containing product data
+        :param stockcode: The product's ID/stockcode
+        :param today: Date the data was fetched in YYYY-MM-DD format
+        :returns: ProductRecord
+        """
+        return self._map_product_data(product_data, stockcode, today)
+
+    def _archive_payload(self, product_data: Dict[str, Any], stockcode: str, today: str):
+        """Store the raw payload in the payload archive, if one is configured."""
+        if self.payload_archive is not None:
+            try:
+                self.payload_archive.store(self._store_name.lower(), stockcode, today, product_data)
+            except Exception as e:
+                print(f"Error archiving payload for product {stockcode}: {str(e)}")
+
     def fetch_product(self, product_id: str, url: str = None) -> Optional[Dict[str, Any]]:
         """
         Search for a product by its ID and return its details.
@@ -49,6 +76,19 @@ class ProductBaseService(ABC):
         :param url: Optional URL to fetch the product from
         :returns: Dictionary containing product details or None if not found
         """
+        try:
+            return self._fetch_product_data(product_id, url)
+        except httpx.RequestError as e:
+            print(f"Error fetching product {product_id}: {str(e)}")
+            return None
+
+    def _fetch_product_data(self, product_id: str, url: str = None) -> Optional[Dict[str, Any]]:
+        """
+        Fetch a product page and extract its details, letting network errors propagate.
+        :param product_id: The product's ID/stockcode
+        :param url: Optional URL to fetch the product from
+        :returns: Dictionary containing product details or None if the page has none
+        """
         if url is None:
             url = f"{self._product_url}/{product_id}"
 
@@ -59,30 +99,61 @@ class ProductBaseService(ABC):
                           "Safari/537.3",
         }
 
-        try:
-            result = httpx.get(url, headers=headers, timeout=30.0)
+        result = httpx.get(url, headers=headers, timeout=30.0)
 
-            # 200 - OK | 308 - Permanent Redirect
-            if result.status_code != 200 and result.status_code != 308:
-                result.raise_for_status()
+        # 200 - OK | 308 - Permanent Redirect
+        if result.status_code != 200 and result.status_code != 308:
+            result.raise_for_status()
 
+        # Handle the 308 Permanent Redirect
+        if result.status_code == 308 and not self.has_been_redirected:
+            self.has_been_redirected = True
             # Handle the 308 Permanent Redirect
-            if result.status_code == 308 and not self.has_been_redirected:
-                self.has_been_redirected = True
-                # Handle the 308 Permanent Redirect
-                new_url = result.headers.get('Location')
-                if new_url:
-                    return self.fetch_product(product_id, new_url)
+            new_url = result.headers.get('Location')
+            if new_url:
+                return self._fetch_product_data(product_id, new_url)
 
-            self.has_been_redirected = False
-            decoded_str = result.content.decode('utf-8', errors='ignore')
-            return self._extract_search_results(decoded_str)
+        self.has_been_redirected = False
+        decoded_str = result.content.decode('utf-8', errors='ignore')
+        return self._extract_search_results(decoded_str)
 
-        except httpx.RequestError as e:
-            print(f"Error fetching product {product_id}: {str(e)}")
-            return None
+    def fetch_products_by_stockcodes(self, stockcodes: List[str]) -> FetchResult:
+        """
+        Fetch products for an update run without aborting on individual products.
+        Products that return 404/410 or have no product details are reported as missing,
+        other HTTP and network errors as failed.
+        :param stockcodes: List of product stockcodes to process
+        :returns: FetchResult with the fetched products and the missing and failed stockcodes
+        """
+        today = datetime.now().strftime('%Y-%m-%d')
+        result = FetchResult(products=[], missing=[], failed=[])
+
+        for stockcode in stockcodes:
+            try:
+                product_data = self._fetch_product_data(product_id=stockcode)
+            except httpx.HTTPStatusError as e:
+                self.has_been_redirected = False
+                if e.response.status_code in (404, 410):
+                    result.missing.append(stockcode)
+                else:
+                    print(f"Error fetching product {stockcode}: {str(e)}")
+                    result.failed.append(stockcode)
+                continue
+            except httpx.RequestError as e:
+                self.has_been_redirected = False
+                print(f"Error fetching product {stockcode}: {str(e)}")
+                result.failed.append(stockcode)
+                continue
+
+            if product_data:
+                self._archive_payload(product_data, stockcode, today)
+                result.products.append(self._map_product_data(product_data, stockcode, today))
+            else:
+                result.missing.append(stockcode)
+
+        return result
 
-    def get_products_by_stockcodes(self, stockcodes: List[str]) -> List[Product]:
+    def get_products_by_stockcodes(self, stockcodes: List[str]) -> List[ProductRecord]:
         """
         Process products and fetch their details.
         :param stockcodes: List of product stockcodes to process
@@ -94,6 +165,7 @@ class ProductBaseService(ABC):
         for stockcode in stockcodes:
             product_data = self.fetch_product(product_id=stockcode)
             if product_data:
+                self._archive_payload(product_data, stockcode, today)
                 row = self._map_product_data(product_data, stockcode, today)
                 rows.append(row)
             else:
@@ -101,11 +173,11 @@ class ProductBaseService(ABC):
 
         return rows
 
-    def get_product_by_stockcode(self, stockcode: str) -> Product:
+    def get_product_by_stockcode(self, stockcode: str) -> ProductRecord:
         """
         Get product details by stockcode.
         :param stockcode: The product's ID/stockcode
-        :returns: Product if found
+        :returns: ProductRecord if found
         """
         product = self.get_products_by_stockcodes([stockcode])[0]
         if product:
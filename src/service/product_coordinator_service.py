@@ -1,40 +1,92 @@
-from typing import Dict, List
-from src.models.product import Product
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional
+from src.models.product_record import ProductRecord
+from src.repository.payload_archive import PayloadArchive
 from src.service.woolworths_service import WoolworthsService
 from src.service.coles_service import ColesService
 from src.service.product_base_service import ProductBaseService
+from src.service.lookup_cache import LookupCache
+
+
+class UpdateResult(NamedTuple):
+    """Outcome of an update run across all stores."""
+    products: List[ProductRecord]
+    fetched: Dict[str, List[str]]
+    missing: Dict[str, List[str]]
+    failed: Dict[str, List[str]]
+
+    @property
+    def wasted_requests(self) -> int:
+        """Number of requests spent on products that turned out to be missing."""
+        return sum(len(stockcodes) for stockcodes in self.missing.values())
 
 
 class ProductCoordinatorService:
-    def __init__(self):
+    def __init__(self, lookup_ttl_seconds: float = 3600, lookup_cache_size: int = 256,
+                 payload_archive: Optional[PayloadArchive] = None):
         self.services: Dict[str, ProductBaseService] = {
             "woolworths": WoolworthsService(),
             "coles": ColesService()
         }
+        self.payload_archive = payload_archive
+        for service in self.services.values():
+            service.payload_archive = payload_archive
+        self.lookup_cache = LookupCache(ttl_seconds=lookup_ttl_seconds, max_entries=lookup_cache_size)
+
+    def seed_lookup_cache(self, products: Iterable[ProductRecord]):
+        """
+        Seed the stockcode lookup cache with products that are already known to be current.
+        Entries are keyed by the product's date, so records from an earlier day are never served as today's.
+        :param products: Products fetched today, e.g. today's rows from the database
+        """
+        for product in products:
+            self.lookup_cache.put((product.date, product.store.lower(), product.stockcode), product)
 
-    def update_all_products(self, product_lists: Dict[str, List[str]]) -> List[Product]:
+    def update_all_products(self, product_lists: Dict[str, List[str]]) -> UpdateResult:
         """
         Update products from all services.
         :param product_lists: Dictionary mapping store names to lists of stockcodes
-        :returns: Combined list of updated products
+        :returns: UpdateResult with the combined updated products and the missing and failed stockcodes per store
         """
-        all_products = []
+        result = UpdateResult(products=[], fetched={}, missing={}, failed={})
 
         for store_name, service in self.services.items():
             if store_name in product_lists and product_lists[store_name]:
-                store_products = service.get_products_by_stockcodes(product_lists[store_name])
-                all_products.extend(store_products)
+                store_result = service.fetch_products_by_stockcodes(product_lists[store_name])
+                result.products.extend(store_result.products)
+                self.seed_lookup_cache(store_result.products)
+                result.fetched[store_name] = [product.stockcode for product in store_result.products]
+                result.missing[store_name] = store_result.missing
+                result.failed[store_name] = store_result.failed
 
-        return all_products
+        return result
 
-    def get_product_by_stockcode(self, stockcode: str, store: str) -> Product:
+    def get_product_by_stockcode(self, stockcode: str, store: str) -> ProductRecord:
         """
         Get product details by stockcode and store.
         :param stockcode: The product's ID/stockcode
         :param store: The store name
-        :returns: Product object or None if not found
+        :returns: ProductRecord or None if not found
         """
         if store in self.services:
-            return self.services[store].get_product_by_stockcode(stockcode)
+            service = self.services[store]
+            today = datetime.now().strftime('%Y-%m-%d')
+            return self.lookup_cache.get_or_fetch((today, store.lower(), stockcode),
+                                                  lambda: service.get_product_by_stockcode(stockcode))
         else:
             raise ValueError(f"Store '{store}' is not supported.")
+
+    def reprocess_payload_archive(self, start_date: Optional[str] = None,
+                                  end_date: Optional[str] = None) -> Iterator[ProductRecord]:
+        """
+        Re-run product mapping over archived raw payloads without any network access.
+        :param start_date: Inclusive start date in YYYY-MM-DD format, or None for no lower bound
+        :param end_date: Inclusive end date in YYYY-MM-DD format, or None for no upper bound
+        :returns: Iterator of ProductRecords mapped from the archived payloads
+        """
+        if self.payload_archive is None:
+            raise ValueError("No payload archive is configured.")
+
+        for store, stockcode, date, payload in self.payload_archive.iter_payloads(start_date, end_date):
+            if store in self.services:
+                yield self.services[store].map_product_data(payload, stockcode, date)
@@ -0,0 +1,169 @@
+import os
+import re
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Tuple
+
+from httpx import HTTPError
+
+from src.models.product_record import ProductRecord
+from src.repository.product_repository import ProductRepository
+from src.service.product_coordinator_service import ProductCoordinatorService
+from src.tools.csv_tools import iter_products_from_csv
+from src.tools.json_tools import iter_products
+
+
+class ImportResult(NamedTuple):
+    """Outcome of a bulk import."""
+    imported: int
+    skipped: int
+    errors: List[str]
+
+
+class ProductImportService:
+    """Bulk import of product entries from files or manually entered rows."""
+    _date_pattern = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+    _true_values = {"true", "yes", "y", "1"}
+    _false_values = {"false", "no", "n", "0", ""}
+
+    def __init__(self, product_repository: ProductRepository, product_coordinator: ProductCoordinatorService):
+        self.product_repository = product_repository
+        self.product_coordinator = product_coordinator
+
+    def import_file(self, input_path: str, batch_size: int = 1000) -> ImportResult:
+        """
+        Import product entries from a CSV, JSON or JSON Lines file.
+        :param input_path: Path to the file to import
+        :param batch_size: Number of rows validated together
+        :returns: ImportResult describing the import
+        """
+        extension = os.path.splitext(input_path)[1].lower()
+        if extension == ".csv":
+            rows = iter_products_from_csv(input_path)
+        elif extension in (".json", ".jsonl"):
+            rows = iter_products(input_path)
+        else:
+            raise ValueError(f"Unsupported file type '{extension}'. Use a CSV or JSON file.")
+        return self.import_rows(rows, batch_size=batch_size)
+
+    def import_rows(self, rows: Iterable[Dict[str, Any]], batch_size: int = 1000) -> ImportResult:
+        """
+        Validate product entries in batches and save them in one transaction.
+        :param rows: Dictionaries keyed by product field name
+        :param batch_size: Number of rows validated together
+        :returns: ImportResult describing the import
+        """
+        catalog = self.product_repository.get_product_names_by_stockcode()
+        unresolved: Dict[Tuple[str, str], str] = {}
+        records: List[ProductRecord] = []
+        errors: List[str] = []
+        row_count = 0
+
+        for batch in self._batches(rows, batch_size):
+            self._resolve_unknown_names(batch, catalog, unresolved)
+            for offset, row in enumerate(batch):
+                try:
+                    records.append(self._to_record(row, catalog, unresolved))
+                except ValueError as e:
+                    errors.append(f"Row {row_count + offset + 1}: {e}")
+            row_count += len(batch)
+
+        imported = self.product_repository.save_products(records).saved
+        return ImportResult(imported=imported, skipped=row_count - imported - len(errors), errors=errors)
+
+    def resolve_product_name(self, stockcode: str, store: str) -> str:
+        """
+        Get a product name, using the local catalog before falling back to the network.
+        :param stockcode: The product's ID/stockcode
+        :param store: The store name
+        :returns: The product name
+        """
+        catalog = self.product_repository.get_product_names_by_stockcode()
+        name = catalog.get((store.lower(), stockcode))
+        if name is None:
+            product = self.product_coordinator.get_product_by_stockcode(stockcode=stockcode, store=store.lower())
+            name = product.product_name
+        return name
+
+    @staticmethod
+    def _batches(rows: Iterable[Dict[str, Any]], batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _resolve_unknown_names(self, batch: List[Dict[str, Any]], catalog: Dict[Tuple[str, str], str],
+                               unresolved: Dict[Tuple[str, str], str]):
+        """Fetch names for stockcodes missing from both the row and the catalog, once per stockcode."""
+        unknown = set()
+        for row in batch:
+            key = (self._text(row, "store").lower(), self._text(row, "stockcode"))
+            if all(key) and not self._text(row, "product_name") and key not in catalog and key not in unresolved:
+                unknown.add(key)
+
+        for store, stockcode in sorted(unknown):
+            try:
+                product = self.product_coordinator.get_product_by_stockcode(stockcode=stockcode, store=store)
+                catalog[(store, stockcode)] = product.product_name
+            except (ValueError, HTTPError) as e:
+                unresolved[(store, stockcode)] = str(e)
+
+    def _to_record(self, row: Dict[str, Any], catalog: Dict[Tuple[str, str], str],
+                   unresolved: Dict[Tuple[str, str], str]) -> ProductRecord:
+        date = self._text(row, "date")
+        stockcode = self._text(row, "stockcode")
+        store = self._text(row, "store")
+        if not date or not stockcode or not store or self._text(row, "price") == "":
+            raise ValueError("Date, Stockcode, Store and Price are required fields.")
+        if not self._date_pattern.match(date):
+            raise ValueError("Date must be in YYYY-MM-DD format.")
+
+        product_name = self._text(row, "product_name") or catalog.get((store.lower(), stockcode))
+        if not product_name:
+            reason = unresolved.get((store.lower(), stockcode), "not found in the local catalog")
+            raise ValueError(f"Could not resolve stockcode '{stockcode}' in store '{store}': {reason}")
+
+        price = self._float(row, "price")
+        return ProductRecord(
+            date=date,
+            stockcode=stockcode,
+            product_name=product_name,
+            price=price,
+            is_on_special=self._bool(row, "is_on_special"),
+            is_half_price=self._bool(row, "is_half_price"),
+            was_price=self._float(row, "was_price", default=price),
+            savings_amount=self._float(row, "savings_amount"),
+            package_size=self._text(row, "package_size").upper(),
+            unit_weight_in_grams=self._float(row, "unit_weight_in_grams"),
+            cup_price=self._float(row, "cup_price"),
+            cup_measure=self._text(row, "cup_measure"),
+            cup_string=self._text(row, "cup_string"),
+            store=store,
+        )
+
+    @staticmethod
+    def _text(row: Dict[str, Any], field: str) -> str:
+        value = row.get(field)
+        return "" if value is None else str(value).strip()
+
+    def _float(self, row: Dict[str, Any], field: str, default: float = 0.0) -> float:
+        value = self._text(row, field)
+        if value == "":
+            return default
+        try:
+            return float(value)
+        except ValueError:
+            raise ValueError(f"{field} must be a valid number.")
+
+    def _bool(self, row: Dict[str, Any], field: str) -> bool:
+        value = row.get(field)
+        if isinstance(value, bool):
+            return value
+        text = self._text(row, field).lower()
+        if text in self._true_values:
+            return True
+        if text in self._false_values:
+            return False
+        raise ValueError(f"{field} must be true or false.")
@@ -0,0 +1,199 @@
+import heapq
+import math
+import random
+import statistics
+from datetime import date, datetime, time, timedelta
+from threading import Event
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from src.models.product_record import ProductRecord
+from src.repository.product_repository import ProductRepository
+from src.service.product_coordinator_service import ProductCoordinatorService
+
+
+class ProductVolatility(NamedTuple):
+    """Observed price behaviour of a product, used to decide how often to refresh it."""
+    store: str
+    stockcode: str
+    last_observed: Optional[date]
+    last_price: Optional[float]
+    change_rate: float
+    refresh_interval_days: int
+    next_special_change: Optional[date]
+
+    def due_date(self) -> date:
+        """Date on which the product should next be refreshed."""
+        if self.last_observed is None:
+            return date.min
+        due = self.last_observed + timedelta(days=self.refresh_interval_days)
+        if self.next_special_change is not None:
+            due = min(due, self.next_special_change)
+        return due
+
+    def change_probability(self, on_date: date) -> float:
+        """Probability that the price has changed since it was last observed, assuming changes arrive at random."""
+        if self.last_observed is None:
+            return 1.0
+        days = max((on_date - self.last_observed).days, 0)
+        probability = 1.0 - math.exp(-self.change_rate * days)
+        if self.next_special_change is not None and self.next_special_change <= on_date:
+            probability = max(probability, 0.9)
+        return probability
+
+
+class ScheduledRefresh(NamedTuple):
+    """A single product refresh scheduled for a point in time."""
+    run_at: datetime
+    priority: float
+    store: str
+    stockcode: str
+    last_price: Optional[float]
+
+
+class RefreshScheduler:
+    """Long-running scheduler that refreshes each product at a rate matched to how often its price changes."""
+
+    def __init__(self, product_repository: ProductRepository, product_coordinator: ProductCoordinatorService,
+                 min_interval_days: int = 1, max_interval_days: int = 14,
+                 window_start: time = time(6, 0), window_end: time = time(22, 0),
+                 jitter_fraction: float = 0.5, clock: Callable[[], datetime] = datetime.now,
+                 rng: Optional[random.Random] = None):
+        self.product_repository = product_repository
+        self.product_coordinator = product_coordinator
+        self.min_interval_days = min_interval_days
+        self.max_interval_days = max_interval_days
+        self.window_start = window_start
+        self.window_end = window_end
+        self.jitter_fraction = jitter_fraction
+        self.clock = clock
+        self.rng = rng or random.Random()
+        self.stats = {"requests": 0, "price_changes": 0, "missing": 0, "failed": 0}
+
+    def estimate_volatility(self) -> Dict[Tuple[str, str], ProductVolatility]:
+        """
+        Estimate the price-change rate and special cycle of every tracked product from its history.
+        :returns: Dictionary keyed by (store, stockcode) with the ProductVolatility of each product.
+        """
+        histories: Dict[Tuple[str, str], List[ProductRecord]] = {}
+        for product in self.product_repository.get_all_products():
+            histories.setdefault((product.store.lower(), product.stockcode), []).append(product)
+
+        volatility = {}
+        for store, stockcodes in self.product_repository.get_all_stockcodes_by_store().items():
+            store = store.lower()
+            if store not in self.product_coordinator.services:
+                continue
+            for stockcode in stockcodes:
+                history = sorted(histories.get((store, stockcode), []))
+                volatility[(store, stockcode)] = self._estimate_product_volatility(store, stockcode, history)
+
+        return volatility
+
+    def _estimate_product_volatility(self, store: str, stockcode: str,
+                                     history: List[ProductRecord]) -> ProductVolatility:
+        if not history:
+            return ProductVolatility(store, stockcode, None, None, 1.0, self.min_interval_days, None)
+
+        dates = [datetime.strptime(product.date, '%Y-%m-%d').date() for product in history]
+        span_days = max((dates[-1] - dates[0]).days, 1)
+        changes = sum(1 for previous, current in zip(history, history[1:]) if previous.price != current.price)
+
+        # With no observed change, assume at most one change over the observed span
+        change_rate = max(changes, 0.5) / span_days
+        interval = round(1 / change_rate / 2)
+        interval = min(max(interval, self.min_interval_days), self.max_interval_days)
+
+        # Specials usually run on a fixed cycle; predict the next start or end from the median gap
+        transitions = [dates[i] for i in range(1, len(history))
+                       if history[i].is_on_special != history[i - 1].is_on_special]
+        next_special_change = None
+        if len(transitions) >= 2:
+            cycle = statistics.median((b - a).days for a, b in zip(transitions, transitions[1:]))
+            if cycle >= 1:
+                next_special_change = transitions[-1] + timedelta(days=int(cycle))
+                while next_special_change <= dates[-1]:
+                    next_special_change += timedelta(days=int(cycle))
+
+        return ProductVolatility(store, stockcode, dates[-1], history[-1].price, change_rate, interval,
+                                 next_special_change)
+
+    def plan_day(self, now: Optional[datetime] = None) -> List[ScheduledRefresh]:
+        """
+        Plan today's refreshes, spread across the remaining refresh window with jitter.
+        Products most likely to have changed are scheduled first.
+        :param now: Current time, defaults to the scheduler clock
+        :returns: Heap of ScheduledRefresh entries ordered by run time
+        """
+        now = now or self.clock()
+        today = now.date()
+        volatility = self.estimate_volatility()
+
+        due = [product for product in volatility.values()
+               if product.due_date() <= today and product.last_observed != today]
+        due.sort(key=lambda product: product.change_probability(today), reverse=True)
+
+        start = max(now, datetime.combine(today, self.window_start))
+        end = datetime.combine(today, self.window_end)
+        if end <= start:
+            end = start + timedelta(minutes=max(len(due), 1))
+        slot = (end - start) / max(len(due), 1)
+
+        heap: List[ScheduledRefresh] = []
+        for index, product in enumerate(due):
+            jitter = slot * self.rng.uniform(-self.jitter_fraction / 2, self.jitter_fraction / 2)
+            run_at = min(max(start + slot * index + slot / 2 + jitter, start), end)
+            heapq.heappush(heap, ScheduledRefresh(run_at, -product.change_probability(today),
+                                                  product.store, product.stockcode, product.last_price))
+        return heap
+
+    def refresh(self, store: str, stockcode: str, last_price: Optional[float] = None) -> bool:
+        """
+        Fetch and save a single product.
+        :param store: The store name
+        :param stockcode: The product's ID/stockcode
+        :param last_price: Last known price, used to count detected price changes
+        :returns: True if the product was fetched
+        """
+        result = self.product_coordinator.update_all_products({store: [stockcode]})
+        self.stats["requests"] += 1
+        self.stats["missing"] += result.wasted_requests
+        self.stats["failed"] += sum(len(stockcodes) for stockcodes in result.failed.values())
+
+        self.product_repository.save_products(result.products)
+        self.product_repository.record_fetch_results(result.fetched, result.missing)
+
+        for product in result.products:
+            if last_price is not None and product.price != last_price:
+                self.stats["price_changes"] += 1
+        return bool(result.products)
+
+    def run(self, stop_event: Optional[Event] = None):
+        """
+        Run the scheduler until stop_event is set, planning a new day after each refresh window closes.
+        :param stop_event: Event used to stop the scheduler
+        """
+        stop_event = stop_event or Event()
+
+        while not stop_event.is_set():
+            now = self.clock()
+            heap = self.plan_day(now)
+            print(f"{now:%Y-%m-%d %H:%M}: {len(heap)} products scheduled for refresh")
+
+            while heap and not stop_event.is_set():
+                scheduled = heap[0]
+                wait_seconds = (scheduled.run_at - self.clock()).total_seconds()
+                if wait_seconds > 0 and stop_event.wait(wait_seconds):
+                    break
+                heapq.heappop(heap)
+                try:
+                    self.refresh(scheduled.store, scheduled.stockcode, scheduled.last_price)
+                except Exception as e:
+                    self.stats["failed"] += 1
+                    print(f"Error refreshing {scheduled.store} {scheduled.stockcode}: {str(e)}")
+
+            self.product_repository.archive_old_products()
+            print(f"Refresh stats: {self.stats}")
+
+            # Sleep until the next day's window opens
+            next_window = datetime.combine(self.clock().date() + timedelta(days=1), self.window_start)
+            stop_event.wait(max((next_window - self.clock()).total_seconds(), 0))
@@ -2,7 +2,7 @@ import json
 import re
 from typing import Optional, Dict, Any
 
-from src.models.product import Product
+from src.models.product_record import ProductRecord
 from src.service.product_base_service import ProductBaseService
 
 
@@ -30,8 +30,8 @@ class WoolworthsService(ProductBaseService):
 
         return None
 
-    def _map_product_data(self, product_data: Dict[str, Any], stockcode: str, today: str) -> Product:
-        return Product(
+    def _map_product_data(self, product_data: Dict[str, Any], stockcode: str, today: str) -> ProductRecord:
+        return ProductRecord(
             date=today,
             stockcode=stockcode,
             product_name=product_data["Product"]["Name"],
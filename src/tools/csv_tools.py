@@ -1,17 +1,27 @@
-from typing import List
+import csv
+from typing import Dict, Iterator, List
 
 import pandas as pd
 
-from src.models.product import Product
+from src.models.product_record import ProductRecord
 
 
-def save_products_to_csv(products: List[Product], output_path: str) -> (bool, str):
+def save_products_to_csv(products: List[ProductRecord], output_path: str) -> (bool, str):
     """Save processed data to CSV file."""
     try:
-        # Convert Peewee models to dictionaries
-        product_dicts = [product.__data__ for product in products]
-        df_new = pd.DataFrame(product_dicts)
+        # Records are plain tuples, so they load straight into a DataFrame
+        df_new = pd.DataFrame(products, columns=list(ProductRecord._fields))
         df_new.to_csv(output_path, mode='w', header=True, index=False)
         return True, f"Products saved to {output_path}"
     except Exception as e:
         return False, f"An error occurred while saving to CSV: {e}"
+
+
+def iter_products_from_csv(input_csv_path: str) -> Iterator[Dict[str, str]]:
+    """
+    Stream product rows from a CSV file with a header row.
+    :param input_csv_path: Path to the CSV file
+    :returns: Iterator of dictionaries keyed by column name
+    """
+    with open(input_csv_path, 'r', newline='') as file:
+        yield from csv.DictReader(file)
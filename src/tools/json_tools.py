@@ -1,7 +1,43 @@
 import json
+from typing import Any, Dict, Iterator
 
 
 def load_products(input_json_path: str) -> list:
     """Load product data from JSON file."""
+    return list(iter_products(input_json_path))
+
+
+def iter_products(input_json_path: str, chunk_size: int = 1 << 16) -> Iterator[Dict[str, Any]]:
+    """
+    Stream product objects from a JSON array file or a JSON Lines file without loading it all at once.
+    :param input_json_path: Path to the JSON file
+    :param chunk_size: Number of characters to read per chunk
+    :returns: Iterator of product dictionaries
+    """
+    decoder = json.JSONDecoder()
+
     with open(input_json_path, 'r') as file:
-        return json.load(file)
+        buffer = file.read(chunk_size).lstrip()
+        in_array = buffer.startswith('[')
+        if in_array:
+            buffer = buffer[1:]
+
+        while True:
+            # Skip separators between objects
+            buffer = buffer.lstrip().lstrip(',').lstrip()
+            if in_array and buffer.startswith(']'):
+                return
+
+            try:
+                product, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                chunk = file.read(chunk_size)
+                if not chunk:
+                    if buffer.strip():
+                        raise ValueError(f"Invalid or truncated JSON in {input_json_path}")
+                    return
+                buffer += chunk
+                continue
+
+            yield product
+            buffer = buffer[end:]
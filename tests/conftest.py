@@ -0,0 +1,21 @@
+import os
+import shutil
+
+import pytest
+
+from src.repository import product_repository as product_repository_module
+from src.repository.product_repository import ProductRepository
+
+SHIPPED_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          "resources", "database", "products.db")
+
+
+@pytest.fixture
+def repository(tmp_path, monkeypatch):
+    """ProductRepository backed by a temporary copy of the shipped database."""
+    db_path = tmp_path / "products.db"
+    shutil.copyfile(SHIPPED_DB, db_path)
+    monkeypatch.setattr(product_repository_module, "get_writable_db_path", lambda **kwargs: str(db_path))
+    repository = ProductRepository()
+    yield repository
+    repository.close()
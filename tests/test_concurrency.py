@@ -0,0 +1,60 @@
+import threading
+from datetime import date, timedelta
+
+from src.models.product import Product
+
+WRITERS = 3
+READERS = 2
+DAYS = 20
+PRODUCTS_PER_DAY = 20
+
+
+def test_concurrent_reads_and_writes_lose_nothing(repository):
+    """Writers and readers share one repository; no write may fail with 'database is locked' or go missing."""
+    base = repository.get_all_products()[0]
+    errors = []
+    reads = [0] * READERS
+    writers_done = threading.Event()
+
+    def write(writer: int):
+        try:
+            for day_offset in range(DAYS):
+                day = str(date(2030, 1, 1) + timedelta(days=day_offset))
+                records = [base._replace(date=day, stockcode=f"stress-{writer}-{i}") for i in range(PRODUCTS_PER_DAY)]
+                # Mix single saves and batches so both write paths contend for the writer
+                if day_offset % 2:
+                    repository.save_products(records)
+                else:
+                    for record in records[:5]:
+                        repository.save_product(record)
+                    repository.save_products(records[5:])
+        except Exception as error:
+            errors.append(error)
+
+    def read(reader: int):
+        try:
+            while not writers_done.is_set():
+                repository.get_all_products()
+                repository.get_all_stockcodes_by_store()
+                repository.get_products_between("2030-01-01", "2030-01-15")
+                reads[reader] += 1
+        except Exception as error:
+            errors.append(error)
+        finally:
+            repository.database.close()
+
+    readers = [threading.Thread(target=read, args=(i,)) for i in range(READERS)]
+    writers = [threading.Thread(target=write, args=(i,)) for i in range(WRITERS)]
+    for thread in readers + writers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    writers_done.set()
+    for thread in readers:
+        thread.join()
+
+    assert errors == []
+    assert all(reads)
+    saved = repository.writer.execute(lambda: Product.select().where(Product.date >= "2030-01-01").count())
+    assert saved == WRITERS * DAYS * PRODUCTS_PER_DAY
+    assert len(repository.get_products_between("2030-01-01")) == saved
@@ -0,0 +1,11 @@
+import pytest
+
+
+def test_writes_after_close_raise_instead_of_blocking(repository):
+    repository.writer.execute(lambda: None)
+    repository.writer.close()
+
+    with pytest.raises(RuntimeError):
+        repository.writer.execute(lambda: None)
+    # Closing twice is harmless, e.g. when the fixture closes the repository again
+    repository.writer.close()
@@ -0,0 +1,60 @@
+from datetime import datetime
+
+from src.models.product_record import ProductRecord
+from src.service import product_coordinator_service as coordinator_module
+from src.service.product_coordinator_service import ProductCoordinatorService
+
+
+class FakeService:
+    """Stands in for a store service and stamps lookups with the fake date."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def get_product_by_stockcode(self, stockcode: str) -> ProductRecord:
+        self.calls += 1
+        return ProductRecord(FakeDatetime.today, stockcode, "Milk", 4.0, False, False, 4.0, 0.0, "3L", 3000.0,
+                             1.33, "1L", "$1.33 / 1L", "Woolworths")
+
+
+class FakeDatetime:
+    today = "2030-01-01"
+
+    @classmethod
+    def now(cls) -> datetime:
+        return datetime.strptime(cls.today, "%Y-%m-%d")
+
+
+def test_lookups_do_not_serve_yesterdays_record(monkeypatch):
+    monkeypatch.setattr(coordinator_module, "datetime", FakeDatetime)
+    monkeypatch.setattr(FakeDatetime, "today", "2030-01-01")
+    coordinator = ProductCoordinatorService()
+    service = FakeService()
+    coordinator.services = {"woolworths": service}
+
+    assert coordinator.get_product_by_stockcode("1", "woolworths").date == "2030-01-01"
+    assert coordinator.get_product_by_stockcode("1", "woolworths").date == "2030-01-01"
+    assert service.calls == 1
+
+    # Just after midnight the cached entry is still within its TTL but belongs to yesterday
+    monkeypatch.setattr(FakeDatetime, "today", "2030-01-02")
+    assert coordinator.get_product_by_stockcode("1", "woolworths").date == "2030-01-02"
+    assert service.calls == 2
+
+
+def test_seeded_records_only_answer_lookups_for_their_date(monkeypatch):
+    monkeypatch.setattr(coordinator_module, "datetime", FakeDatetime)
+    monkeypatch.setattr(FakeDatetime, "today", "2030-01-02")
+    coordinator = ProductCoordinatorService()
+    service = FakeService()
+    coordinator.services = {"woolworths": service}
+
+    yesterday = service.get_product_by_stockcode("1")._replace(date="2030-01-01")
+    today = service.get_product_by_stockcode("2")
+    coordinator.seed_lookup_cache([yesterday, today])
+    service.calls = 0
+
+    assert coordinator.get_product_by_stockcode("2", "woolworths") == today
+    assert service.calls == 0
+    assert coordinator.get_product_by_stockcode("1", "woolworths").date == "2030-01-02"
+    assert service.calls == 1
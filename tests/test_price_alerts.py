@@ -0,0 +1,45 @@
+from src.models.price_alert import ProductPriceStats
+from src.models.product_record import ProductRecord
+from src.repository.product_repository import ProductRepository
+
+
+def _milk(date, price):
+    return ProductRecord(date, "888140", "Woolworths Full Cream Milk", price, False, False, price, 0.0, "3L",
+                         3171.0, price / 3, "1L", f"${price / 3:.2f} / 1L", "Woolworths")
+
+
+def test_save_products_reports_alerts_inserted(repository):
+    repository.add_alert_rule("Cheap milk", "below_price", threshold=10.0, stockcode="888140")
+
+    result = repository.save_products([_milk("2030-01-01", 4.0), _milk("2030-01-02", 4.1)])
+    assert result.saved == 2
+    assert result.alerts == 2
+
+    # Re-saving the same observations neither stores rows nor fires alerts again
+    result = repository.save_products([_milk("2030-01-01", 4.0)])
+    assert result.saved == 0
+    assert result.alerts == 0
+
+
+def test_alert_count_is_not_capped_by_alert_listing(repository):
+    repository.add_alert_rule("Cheap milk", "below_price", threshold=10.0, stockcode="888140")
+    products = [_milk(f"2031-{month:02d}-{day:02d}", 4.0) for month in range(1, 13) for day in range(1, 29)]
+    products += [_milk(f"2032-{month:02d}-{day:02d}", 4.0) for month in range(1, 13) for day in range(1, 29)]
+
+    result = repository.save_products(products)
+    assert result.alerts == len(products) > 500
+    assert len(repository.get_price_alerts()) == 500
+
+
+def test_price_stats_are_rebuilt_from_archive_only_history(repository):
+    repository.archive_old_products(horizon_days=-1)
+    repository.writer.execute(lambda: ProductPriceStats.delete().execute())
+    repository.close()
+
+    reopened = ProductRepository()
+    try:
+        assert ProductPriceStats.select().where(ProductPriceStats.stockcode == "888140").exists()
+        reopened.add_alert_rule("Lowest ever", "all_time_low", stockcode="888140")
+        assert reopened.save_products([_milk("2030-01-01", 0.5)]).alerts == 1
+    finally:
+        reopened.close()
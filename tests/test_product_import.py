@@ -0,0 +1,22 @@
+from src.models.product import Product
+from src.service.product_import_service import ProductImportService
+
+
+def _rows(dates):
+    return [dict(date=date, stockcode="888140", product_name="Woolworths Full Cream Milk", price="4.35",
+                 store="Woolworths") for date in dates]
+
+
+def test_historical_rows_are_imported_straight_into_the_archive(repository):
+    service = ProductImportService(repository, product_coordinator=None)
+    sqlite_rows = Product.select().count()
+
+    result = service.import_rows(_rows(["2001-01-01", "2001-02-01", "2030-01-01"]))
+    assert result.imported == 3
+    assert repository.archive.months() == ["2001-01", "2001-02"]
+    # Only the recent row goes through SQLite
+    assert Product.select().count() == sqlite_rows + 1
+
+    # Importing the same file again skips rows already in either tier
+    assert service.import_rows(_rows(["2001-01-01", "2030-01-01"])).skipped == 2
+    assert len(repository.get_products_between("2001-01-01", "2001-12-31")) == 2
@@ -0,0 +1,43 @@
+from src.models.product import Product
+from src.repository.product_query import ProductQuery
+
+
+def _archive_everything(repository):
+    """Move every row into the Parquet archive so queries exercise both tiers."""
+    repository.archive_old_products(horizon_days=-1)
+    assert repository.archive.months()
+
+
+def test_unknown_store_returns_no_rows(repository):
+    _archive_everything(repository)
+    assert repository.query_products(ProductQuery().for_stores(["coles"])) == []
+
+
+def test_empty_value_sets_return_no_rows(repository):
+    _archive_everything(repository)
+    assert repository.query_products(ProductQuery().for_stores([])) == []
+    assert repository.query_products(ProductQuery().for_stockcodes([])) == []
+    assert repository.query_products(ProductQuery().for_product_names([])) == []
+
+
+def test_store_filter_is_case_insensitive_across_tiers(repository):
+    all_products = repository.get_all_products()
+    repository.archive_old_products(horizon_days=-1)
+    rows = repository.query_products(ProductQuery().for_stores(["WOOLWORTHS"]).select("stockcode", "store"))
+    assert len(rows) == len(all_products)
+
+
+def test_rows_left_in_both_tiers_are_returned_once(repository):
+    all_products = repository.get_all_products()
+    repository.archive_old_products(horizon_days=-1)
+    # Simulate the SQLite delete failing after the archive write succeeded
+    repository.writer.execute(lambda: Product.insert_many(p.to_dict() for p in all_products).execute())
+
+    assert sorted(repository.get_all_products()) == sorted(all_products)
+    names = repository.query_products(ProductQuery().select("product_name"))
+    assert len(names) == len(all_products)
+
+    # Retrying the archive move is safe and clears the SQLite copies
+    repository.archive_old_products(horizon_days=-1)
+    assert Product.select().count() == 0
+    assert sorted(repository.get_all_products()) == sorted(all_products)
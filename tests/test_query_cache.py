@@ -0,0 +1,27 @@
+from src.models.product_record import ProductRecord
+from src.repository.product_repository import ProductRepository
+
+
+def test_cache_sees_writes_from_another_repository(repository):
+    cached = repository.get_all_products()
+    assert repository.get_all_products() == cached
+
+    # A second repository on the same file stands in for the scheduler or another GUI process
+    other = ProductRepository()
+    try:
+        other.save_products([cached[0]._replace(date="2030-01-01")])
+        assert len(repository.get_all_products()) == len(cached) + 1
+    finally:
+        other.close()
+
+
+def test_cache_sees_archive_writes_from_another_repository(repository):
+    cached = repository.get_all_products()
+    record: ProductRecord = cached[0]._replace(date="2001-01-01")
+
+    other = ProductRepository()
+    try:
+        other.archive.write_records([record])
+        assert record in repository.get_all_products()
+    finally:
+        other.close()
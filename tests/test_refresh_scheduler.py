@@ -0,0 +1,161 @@
+import heapq
+import random
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List
+
+from src.models.product_record import ProductRecord
+from src.repository.product_repository import SaveResult
+from src.service.product_coordinator_service import UpdateResult
+from src.service.refresh_scheduler import RefreshScheduler
+
+START = date(2030, 1, 1)
+
+
+def _record(day: date, stockcode: str, price: float, on_special: bool = False) -> ProductRecord:
+    return ProductRecord(str(day), stockcode, f"Product {stockcode}", price, on_special, False, price, 0.0, "1kg",
+                         1000.0, price, "1kg", f"${price:.2f} / 1kg", "Woolworths")
+
+
+class FakeRepository:
+    """In-memory stand-in for ProductRepository holding the observed history."""
+
+    def __init__(self, products: List[ProductRecord] = (), stockcodes: List[str] = ()):
+        self.products = list(products)
+        self.stockcodes = sorted(set(stockcodes) | {product.stockcode for product in self.products})
+
+    def get_all_products(self) -> List[ProductRecord]:
+        return list(self.products)
+
+    def get_all_stockcodes_by_store(self) -> Dict[str, List[str]]:
+        return {"Woolworths": self.stockcodes}
+
+    def save_products(self, products: List[ProductRecord]) -> SaveResult:
+        self.products.extend(products)
+        return SaveResult(saved=len(products), alerts=0)
+
+    def record_fetch_results(self, fetched, missing):
+        pass
+
+
+class FakeCoordinator:
+    """Answers refreshes from a price model instead of the network."""
+
+    def __init__(self, price_model=None):
+        self.services = {"woolworths": None}
+        self.price_model = price_model
+        self.today = START
+
+    def update_all_products(self, product_lists: Dict[str, List[str]]) -> UpdateResult:
+        products = [self.price_model(self.today, stockcode) for stockcode in product_lists["woolworths"]]
+        return UpdateResult(products=products, fetched={"woolworths": [p.stockcode for p in products]},
+                            missing={}, failed={})
+
+
+def _scheduler(repository, coordinator=None, **kwargs) -> RefreshScheduler:
+    return RefreshScheduler(repository, coordinator or FakeCoordinator(), rng=random.Random(1), **kwargs)
+
+
+def _daily(stockcode: str, prices: List[float], specials: List[bool] = None) -> List[ProductRecord]:
+    specials = specials or [False] * len(prices)
+    return [_record(START + timedelta(days=i), stockcode, price, special)
+            for i, (price, special) in enumerate(zip(prices, specials))]
+
+
+def test_refresh_interval_is_clamped_to_the_configured_range():
+    scheduler = _scheduler(FakeRepository(), min_interval_days=1, max_interval_days=14)
+
+    stable = scheduler._estimate_product_volatility("woolworths", "1", _daily("1", [5.0] * 365))
+    assert stable.refresh_interval_days == 14
+
+    volatile = scheduler._estimate_product_volatility("woolworths", "2", _daily("2", [5.0, 6.0] * 30))
+    assert volatile.refresh_interval_days == 1
+
+    unknown = scheduler._estimate_product_volatility("woolworths", "3", [])
+    assert unknown.refresh_interval_days == 1
+    assert unknown.due_date() == date.min
+    assert unknown.change_probability(START) == 1.0
+
+
+def test_next_special_change_is_predicted_from_the_cycle():
+    scheduler = _scheduler(FakeRepository())
+    # On special for a week every other week; the last transition is on day 42
+    specials = [(day // 7) % 2 == 1 for day in range(45)]
+    prices = [2.5 if special else 5.0 for special in specials]
+
+    volatility = scheduler._estimate_product_volatility("woolworths", "1", _daily("1", prices, specials))
+    assert volatility.next_special_change == START + timedelta(days=49)
+    assert volatility.due_date() <= START + timedelta(days=49)
+    assert volatility.change_probability(START + timedelta(days=49)) >= 0.9
+
+
+def test_plan_day_schedules_due_products_by_change_probability_inside_the_window():
+    today = START + timedelta(days=60)
+    history = (
+        # Observed today: never rescheduled the same day
+        _daily("fresh", [5.0, 6.0] * 30 + [5.0])
+        # Flat for two months and seen yesterday: not due for another two weeks
+        + _daily("flat", [5.0] * 60)
+        # Changes daily and seen yesterday: due, high probability
+        + _daily("volatile", [5.0, 6.0] * 30)
+        # One change in a month, last seen 20 days ago: due, lower probability
+        + _daily("slow", [5.0] * 20 + [6.0] * 20)
+    )
+    repository = FakeRepository(history, stockcodes=["new"])
+    scheduler = _scheduler(repository, window_start=time(6, 0), window_end=time(22, 0))
+
+    now = datetime.combine(today, time(10, 0))
+    heap = scheduler.plan_day(now)
+    planned = [heapq.heappop(heap) for _ in range(len(heap))]
+
+    # Never-observed products have probability 1 and go first
+    assert [entry.stockcode for entry in planned] == ["new", "volatile", "slow"]
+    assert all(now <= entry.run_at <= datetime.combine(today, time(22, 0)) for entry in planned)
+    assert [entry.priority for entry in planned] == sorted(entry.priority for entry in planned)
+
+
+def _price_model(day: date, stockcode: str) -> ProductRecord:
+    """Specials on a fortnightly cycle, a few products with random changes, the rest flat."""
+    kind, index = stockcode.split("-")
+    index = int(index)
+    day_index = (day - START).days
+    if kind == "special":
+        on_special = ((day_index + index) // 7) % 2 == 1
+        return _record(day, stockcode, 2.5 if on_special else 5.0, on_special)
+    if kind == "random":
+        # Deterministic per product and day, changing on roughly 5% of days
+        changes = sum(random.Random(f"{stockcode}-{d}").random() < 0.05 for d in range(day_index + 1))
+        return _record(day, stockcode, 5.0 + changes, False)
+    return _record(day, stockcode, 5.0, False)
+
+
+def test_simulated_requests_against_refetching_everything_daily():
+    """Over four weeks the scheduler makes 159 requests against 1260 and catches 40 of 49 changes on the day."""
+    stockcodes = ([f"special-{i}" for i in range(10)] + [f"random-{i}" for i in range(5)]
+                  + [f"flat-{i}" for i in range(30)])
+    warm_up_days, simulated_days = 60, 28
+    history = [_price_model(START + timedelta(days=d), s) for d in range(warm_up_days) for s in stockcodes]
+    repository = FakeRepository(history)
+    coordinator = FakeCoordinator(_price_model)
+    scheduler = _scheduler(repository, coordinator)
+
+    fetched_on: Dict[date, set] = {}
+    for offset in range(warm_up_days, warm_up_days + simulated_days):
+        coordinator.today = START + timedelta(days=offset)
+        heap = scheduler.plan_day(datetime.combine(coordinator.today, time(6, 0)))
+        while heap:
+            entry = heapq.heappop(heap)
+            scheduler.refresh(entry.store, entry.stockcode, entry.last_price)
+            fetched_on.setdefault(coordinator.today, set()).add(entry.stockcode)
+
+    changes = caught = 0
+    for offset in range(warm_up_days, warm_up_days + simulated_days):
+        day = START + timedelta(days=offset)
+        for stockcode in stockcodes:
+            if _price_model(day, stockcode).price != _price_model(day - timedelta(days=1), stockcode).price:
+                changes += 1
+                caught += stockcode in fetched_on.get(day, set())
+
+    daily_requests = len(stockcodes) * simulated_days
+    requests = scheduler.stats["requests"]
+    assert requests < daily_requests * 0.25, f"{requests} requests vs {daily_requests} refetching daily"
+    assert caught >= changes * 0.75, f"caught {caught} of {changes} changes on the day"